@@ -1,87 +1,149 @@
-import torch
-import torchaudio
+import os
+import sys
+from src.tools.startup_profile import StartupProfile
+# `python app.py --profile-startup` (or PROFILE_STARTUP=1) prints import and
+# model load times once the models are ready.
+_profile_startup = '--profile-startup' in sys.argv or os.environ.get('PROFILE_STARTUP') == '1'
+_profile = StartupProfile().install() if _profile_startup else None
+
+# Before gradio, which brings in huggingface_hub: with MODEL_CACHE_DIR set all
+# downloads go there, otherwise to the libraries' persistent defaults under ~/.cache.
+from src.tools import model_cache
+model_cache.configure()
+
 import numpy as np
 import gradio as gr
 from typing import Tuple
-from pathlib import Path
-from pydub import AudioSegment
 from src.tools import stream_porcessor as sp
+from src.tools.model_pool import ModelPool
+from src.tools.session_manager import SessionManager
+from src.tools.transcript_cache import TranscriptCache
+from src.tools.transcript_filter import DEFAULT_BLOCKLIST, TranscriptFilter, load_blocklist
+from src.tools.speech_scorer import MarbleNetScorer
+from src.tools.audio_writer import cleanup_sessions
+from src.tools.metrics import metrics, JsonlSink, PrometheusSink
+
+if os.environ.get('METRICS_PORT'):
+    metrics.add_sink(PrometheusSink()).serve(port=int(os.environ['METRICS_PORT']))
+if os.environ.get('METRICS_JSONL'):
+    metrics.add_sink(JsonlSink(os.environ['METRICS_JSONL']))
+
+# Earlier sessions are kept unless a retention policy is set.
+cleanup_sessions(
+    './sessions',
+    max_age=float(os.environ['SESSION_RETENTION_HOURS']) * 3600 if os.environ.get('SESSION_RETENTION_HOURS') else None,
+    max_bytes=int(float(os.environ['SESSIONS_MAX_GB']) * 2**30) if os.environ.get('SESSIONS_MAX_GB') else None,
+)
+
+# Weights load in the background while gradio binds the port. On CPU-only
+# nodes CPU_QUANTIZE=1 runs ASR and translation with int8 Linear layers.
+_quantize = os.environ.get('CPU_QUANTIZE') == '1'
+# LOCAL_MODEL_COPY=1 saves the loaded weights under the cache dir (safetensors,
+# .nemo for Parakeet) and loads that copy on the next start.
+_asr_options = {'quantize': True} if _quantize else {}
+if os.environ.get('LOCAL_MODEL_COPY') == '1':
+    _asr_options['local_copy'] = True
+_translator_options = dict(_asr_options, quantize=_quantize)
+if os.environ.get('TRANSLATE_GREEDY') == '1':
+    _translator_options['num_beams'] = 1
+_models = ModelPool(
+    asr_backend=os.environ.get('ASR_BACKEND', 'canary'),
+    asr_model=os.environ.get('ASR_MODEL') or None,
+    asr_options=_asr_options or None,
+    translator_options=_translator_options,
+    warmup_duration=float(os.environ.get('ASR_WARMUP_SECONDS', '1.0')),
+    intra_op_threads=int(os.environ['TORCH_THREADS']) if os.environ.get('TORCH_THREADS') else None,
+    inter_op_threads=int(os.environ['TORCH_INTEROP_THREADS']) if os.environ.get('TORCH_INTEROP_THREADS') else None,
+    # ASR_PROCESSES=N decodes in N worker processes, each with ASR_THREADS_PER_PROCESS torch threads.
+    asr_processes=int(os.environ.get('ASR_PROCESSES', '0')),
+    asr_threads_per_process=int(os.environ['ASR_THREADS_PER_PROCESS']) if os.environ.get('ASR_THREADS_PER_PROCESS') else None,
+)
+if _profile is not None:
+    _profile.report_when_ready(_models)
+_transcripts = TranscriptCache(max_entries=2048, path=None)
+# VAD_SCORER=marblenet drops clicks and fan noise before they reach ASR.
+_vad_scorer = MarbleNetScorer() if os.environ.get('VAD_SCORER') == 'marblenet' else None
+# HALLUCINATION_BLOCKLIST: file of phrases, one per line, dropped before translation.
+_filter = TranscriptFilter(
+    blocklist=load_blocklist(os.environ['HALLUCINATION_BLOCKLIST']) if os.environ.get('HALLUCINATION_BLOCKLIST') else DEFAULT_BLOCKLIST,
+)
+_sessions = SessionManager(
+    factory=lambda session_id: sp.StreamProcessor(
+        sample_rate=16_000,
+        model_pool=_models,
+        session_id=session_id,
+        transcript_cache=_transcripts,
+        partial_interval=1.0,
+        vad_scorer=_vad_scorer,
+        speculative_silence=float(os.environ['SPECULATIVE_SILENCE']) if os.environ.get('SPECULATIVE_SILENCE') else None,
+        stream_translation=os.environ.get('TRANSLATE_STREAM') == '1',
+        transcript_filter=_filter,
+    ),
+    idle_timeout=600.0,
+)
+HISTORY_PAGE_SIZE = 50
+
+def stream_fn(audio: Tuple[int, np.ndarray], rendered_version: int, request: gr.Request):
+    # Only the bounded transcript window is sent, and nothing at all on
+    # ticks where no row changed.
+    try:
+        processor = _sessions.get(request.session_hash)
+        audio_sr, audio_chunk = audio
+        
+        # Mono float32 at 16kHz, then VAD and the worker pipeline
+        processor.process_audio(audio_sr, audio_chunk)
+        processor.update_transcript()
 
-_processor = sp.StreamProcessor(sample_rate=16_000)
+        if processor.transcript.version == rendered_version:
+            return gr.skip(), gr.skip()
+        return _table_rows(processor.transcript.rows()), processor.transcript.version
+    except Exception as e:
+        print(f"Error in stream_fn: {e}")
+        return gr.skip(), gr.skip()
 
-def _convert_to_float32(y):
-    if y.dtype == np.int16:
-        return y.astype(np.float32) / 32768.0
-    elif y.dtype == np.int32:
-        return y.astype(np.float32) / 2147483648.0
-    elif y.dtype == np.float64:
-        return y.astype(np.float32)
-    else:
-        return y.astype(np.float32)
 
+def _table_rows(rows: list) -> list:
+    # Transcript rows are [segment_id, chunk_path, duration, text_en, text_ru]
+    return [[row[0]] + row[2:] for row in rows]
 
-def stream_fn(audio: Tuple[int, np.ndarray], segments_state: list):
-    try:
-        audio_sr, audio_chunk = audio
-        
-        # Convert to mono if stereo
-        if audio_chunk.ndim > 1:
-            audio_chunk = audio_chunk.mean(axis=1)
-        
-        # Properly convert to float32 with correct scaling
-        audio_chunk = _convert_to_float32(audio_chunk)
-        
-        # Clip to [-1, 1] range (safety measure)
-        audio_chunk = np.clip(audio_chunk, -1.0, 1.0)
 
-        # Resample to 16kHz
-        y_tensor = torch.tensor(audio_chunk)
-        y_resampled = torchaudio.functional.resample(y_tensor, orig_freq=audio_sr, new_freq=_processor.sample_rate).numpy()
-        
-        # Process through pipeline
-        _processor.process_chunk(y_resampled)
+def show_history(page: int, request: gr.Request):
+    transcript = _sessions.get(request.session_hash).transcript
+    page = min(max(page, 0), max(transcript.history_pages(HISTORY_PAGE_SIZE) - 1, 0))
+    return _table_rows(transcript.page(page, HISTORY_PAGE_SIZE)), page
 
-        transcription = _processor.get_transcribe()
-        if transcription:
-            chunk_path, duration, text_en, text_ru = transcription
-            segments_state.append([chunk_path, f"{duration:.3f}s", text_en, text_ru])
 
-        return segments_state, segments_state
-    except Exception as e:
-        print(f"Error in stream_fn: {e}")
-        return segments_state, segments_state
+def older_history(page: int, request: gr.Request):
+    return show_history(page + 1, request)
 
 
-def play_segment(evt: gr.SelectData, raw_ts_list) -> Tuple[gr.Audio, str, str]:
-    if not isinstance(raw_ts_list, list):
-        print(f"Warning: raw_ts_list is not a list ({type(raw_ts_list)}). Cannot play segment.")
-        return gr.Audio(value=None, visible=False)
+def newer_history(page: int, request: gr.Request):
+    return show_history(page - 1, request)
 
-    selected_index = evt.index[0]
 
-    if selected_index < 0 or selected_index >= len(raw_ts_list):
-        print(f"Invalid index {selected_index} selected for list of length {len(raw_ts_list)}.")
-        return gr.Audio(value=None, visible=False)
+def play_segment(evt: gr.SelectData, request: gr.Request) -> Tuple[gr.Audio, str, str]:
+    # The clicked row carries its segment id, so no copy of the table is kept per client.
+    if not evt.row_value:
+        return gr.Audio(value=None, visible=False), None, None
 
-    current_audio_path = raw_ts_list[selected_index][0]
-    
-    if not current_audio_path or not Path(current_audio_path).exists():
-        print(f"Warning: Audio path '{current_audio_path}' not found or invalid for clipping.")
-        return gr.Audio(value=None, visible=False)
+    segment_id = int(evt.row_value[0])
+    processor = _sessions.get(request.session_hash)
+    samples = processor.read_segment(segment_id)
+    frame_rate = processor.sample_rate
 
-    audio = AudioSegment.from_file(current_audio_path)
-    samples = np.array(audio.get_array_of_samples())
-    frame_rate = audio.frame_rate
+    if samples is None:
+        print(f"Warning: Segment {segment_id} not found (still in progress or dropped).")
+        return gr.Audio(value=None, visible=False), None, None
 
     if samples.size == 0:
         print(f"Warning: Audio resulted in empty samples array.")
-        return gr.Audio(value=None, visible=False)
+        return gr.Audio(value=None, visible=False), None, None
 
-    text_en, text_ru = _processor.transcribe_segment(speech_array=samples)
+    text_en, text_ru = processor.transcribe_segment(speech_array=samples)
 
     return (
         gr.Audio(value=(frame_rate, samples), autoplay=True, 
-                label=f"Segment: {current_audio_path}", 
+                label=f"Segment: {segment_id}", 
                 interactive=False, 
                 visible=True),
         text_en, 
@@ -89,6 +151,18 @@ def play_segment(evt: gr.SelectData, raw_ts_list) -> Tuple[gr.Audio, str, str]:
     )
 
 
+def start_session(request: gr.Request):
+    _sessions.get(request.session_hash).start()
+
+
+def stop_session(request: gr.Request):
+    _sessions.get(request.session_hash).stop()
+
+
+def close_session(request: gr.Request):
+    _sessions.remove(request.session_hash)
+
+
 def handle_deselect():
     return gr.Audio(value=None, visible=False), None, None
 
@@ -106,11 +180,21 @@ with gr.Blocks(title="Live Transcription (ENG -> RUS)", theme=gr.themes.Soft(),
 
     with gr.Row():
         vis_timestamps_df = gr.DataFrame(
-            headers=["Segment Path", "Duration", "English", "Русский"],
-            datatype=["str", "number", "str", "str"],
+            headers=["#", "Duration", "English", "Русский"],
+            datatype=["number", "str", "str", "str"],
             wrap=True,
             label="📝 Результат распознавания",
-            column_widths=["15%", "5%", "40%", "40%"],
+            column_widths=["5%", "10%", "42%", "43%"],
+        )
+    with gr.Accordion("🗂 История", open=False):
+        with gr.Row():
+            older_btn = gr.Button(value="◀ Раньше")
+            newer_btn = gr.Button(value="Позже ▶")
+        history_df = gr.DataFrame(
+            headers=["#", "Duration", "English", "Русский"],
+            datatype=["number", "str", "str", "str"],
+            wrap=True,
+            column_widths=["5%", "10%", "42%", "43%"],
         )
     with gr.Row():
         with gr.Column():
@@ -134,23 +218,28 @@ with gr.Blocks(title="Live Transcription (ENG -> RUS)", theme=gr.themes.Soft(),
                 placeholder="Русская транскрипция появится здесь...",
             )
 
-    segments_state = gr.State([])
+    rendered_version = gr.State(0)
+    history_page = gr.State(0)
 
     input.stream(
         fn=stream_fn,
-        inputs=[input, segments_state],
-        outputs=[vis_timestamps_df, segments_state],
+        inputs=[input, rendered_version],
+        outputs=[vis_timestamps_df, rendered_version],
         stream_every=0.5, # new_chunk duration 0.5 sec
     )
 
-    input.start_recording(fn=_processor.start, inputs=None, outputs=None)
-    input.stop_recording(fn=_processor.stop, inputs=None, outputs=None)
+    input.start_recording(fn=start_session, inputs=None, outputs=None)
+    input.stop_recording(fn=stop_session, inputs=None, outputs=None)
 
-    vis_timestamps_df.select(
-        fn=play_segment,
-        inputs=[segments_state],
-        outputs=[selected_segment_player, output_en, output_ru],
-    )
+    for table in (vis_timestamps_df, history_df):
+        table.select(
+            fn=play_segment,
+            inputs=None,
+            outputs=[selected_segment_player, output_en, output_ru],
+        )
+
+    older_btn.click(fn=older_history, inputs=[history_page], outputs=[history_df, history_page])
+    newer_btn.click(fn=newer_history, inputs=[history_page], outputs=[history_df, history_page])
 
     clear_btn.click(
         fn=handle_deselect,
@@ -158,5 +247,7 @@ with gr.Blocks(title="Live Transcription (ENG -> RUS)", theme=gr.themes.Soft(),
         outputs=[selected_segment_player, output_en, output_ru],
     )
 
+    web.unload(close_session)
+
 if __name__ == "__main__":
     web.launch(debug=False, server_name="0.0.0.0", server_port=8080)
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+CPU inference settings compared with the fp32 baseline: int8 dynamic
+quantization of Linear layers and greedy translation caps. Reports ASR
+RTF, translation seconds per sentence, WER and BLEU (sacrebleu) and their
+deltas from the first configuration.
+
+Each WAV is cut into utterances with the same VoiceDetector settings as
+StreamProcessor; talk.en.txt and talk.ru.txt next to talk.wav are the
+references.
+
+    python -m bench.cpu_fastpath talk.wav --backend parakeet --threads 8
+    python -m bench.cpu_fastpath *.wav --configs fp32,int8-greedy --no-translate
+    python -m bench.cpu_fastpath talk.wav --backend stub --no-translate   # harness only, no torch
+"""
+import time
+import argparse
+import numpy as np
+import soundfile as sf
+from typing import Dict, List, Tuple
+
+from bench.replay import read_reference
+from bench.scoring import bleu, wer
+from src.tools.ingest import AudioIngest
+from src.tools.voice_detector import VoiceDetector
+from src.transcribe import registry
+
+# name -> (ASR backend options, Translator options)
+CONFIGS: Dict[str, Tuple[dict, dict]] = {
+    'fp32': ({}, {}),
+    'int8': ({'quantize': True}, {'quantize': True}),
+    'fp32-greedy': ({}, {'num_beams': 1, 'max_new_tokens': 128}),
+    'int8-greedy': ({'quantize': True}, {'quantize': True, 'num_beams': 1, 'max_new_tokens': 128}),
+}
+
+
+def utterances(path: str, sample_rate: int = 16_000) -> List[np.ndarray]:
+    audio, sr = sf.read(path, dtype='float32')
+    audio = np.array(AudioIngest(sample_rate=sample_rate).process(sr, audio))
+    audio = np.concatenate((audio, np.zeros(2 * sample_rate, dtype=np.float32)))
+    found = []
+    detector = VoiceDetector(
+        sample_rate=sample_rate,
+        frame_duration=0.03,
+        energy_threshold=0.01,
+        min_silence_duration=1.5,
+        max_utterance_duration=20.0,
+        on_speech_end=lambda utterance, duration: found.append(utterance) if duration >= 0.5 else None,
+    )
+    for offset in range(0, len(audio), sample_rate // 2):
+        detector.process_chunk(audio[offset:offset + sample_rate // 2])
+    return found
+
+
+def run_config(name: str, args, inputs: Dict[str, List[np.ndarray]]) -> dict:
+    asr_options, translator_options = CONFIGS[name]
+    if args.max_new_tokens is not None and args.backend == 'canary':
+        asr_options = dict(asr_options, max_new_tokens=args.max_new_tokens)
+
+    asr = registry.create_backend(args.backend, model_name=args.model, **asr_options)
+    asr.transcribe_batch([np.zeros(16_000, dtype=np.float32)])     # warm-up
+    audio_seconds = compute = 0.0
+    hypotheses_en: Dict[str, List[str]] = {}
+    for path, segments in inputs.items():
+        hypotheses_en[path] = []
+        for segment in segments:
+            start = time.perf_counter()
+            hypotheses_en[path].append(asr.transcribe(segment))
+            compute += time.perf_counter() - start
+            audio_seconds += len(segment) / 16_000
+    asr.unload_model()
+    report = {'config': name, 'asr_rtf': compute / max(audio_seconds, 1e-9)}
+
+    hypotheses_ru: Dict[str, List[str]] = {}
+    if args.translate:
+        from src.tools.translator import Translator
+        translator = Translator(source='en', target='ru', **translator_options)
+        translator.warmup()
+        sentences = seconds = 0
+        for path, texts in hypotheses_en.items():
+            hypotheses_ru[path] = []
+            for text in texts:
+                start = time.perf_counter()
+                hypotheses_ru[path].append(translator._generate([text])[0])   # uncached on purpose
+                seconds += time.perf_counter() - start
+                sentences += 1
+        report['translate_seconds'] = seconds / max(sentences, 1)
+        del translator
+
+    for lang, hypotheses, metric, score in (('en', hypotheses_en, 'wer', wer), ('ru', hypotheses_ru, 'bleu', bleu)):
+        pairs = [(read_reference(path, lang), ' '.join(texts)) for path, texts in hypotheses.items()]
+        pairs = [(reference, hypothesis) for reference, hypothesis in pairs if reference is not None]
+        if pairs:
+            report[metric] = score([r for r, _ in pairs], [h for _, h in pairs])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('wav', nargs='+')
+    parser.add_argument('--backend', default='parakeet', help="ASR backend from the registry")
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--configs', default=','.join(CONFIGS), help=f"comma-separated, from {list(CONFIGS)}")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--interop-threads', type=int, default=None)
+    parser.add_argument('--max-new-tokens', type=int, default=None, help="Canary greedy decode cap")
+    parser.add_argument('--no-translate', dest='translate', action='store_false')
+    args = parser.parse_args()
+
+    if args.backend == 'stub':
+        from bench import stubs     # noqa: F401, registers the 'stub' backend, to check the harness without weights
+    if args.threads or args.interop_threads:
+        from src.tools.cpu_fastpath import configure_threads    # imports torch
+        configure_threads(args.threads, args.interop_threads)
+
+    inputs = {path: utterances(path) for path in args.wav}
+    print(f"[I] {sum(len(s) for s in inputs.values())} utterances from {len(inputs)} file(s)")
+
+    reports = [run_config(name, args, inputs) for name in args.configs.split(',')]
+    baseline = reports[0]
+    columns = [c for c in ('asr_rtf', 'translate_seconds', 'wer', 'bleu') if c in baseline]
+    print(f"{'config':<14}" + ''.join(f"{c:>20}" for c in columns))
+    for report in reports:
+        cells = []
+        for c in columns:
+            value = report.get(c, float('nan'))
+            delta = value - baseline.get(c, float('nan'))
+            cells.append(f"{value:>10.3f} ({delta:+.3f})" if report is not baseline else f"{value:>20.3f}")
+        print(f"{report['config']:<14}" + ''.join(f"{cell:>20}" for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
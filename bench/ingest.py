@@ -0,0 +1,84 @@
+"""
+Allocations and CPU cost of converting gradio microphone chunks to mono
+float32, old per-step copies versus AudioIngest's reused buffer.
+
+    python -m bench.ingest --rate 48000 --channels 2 --dtype int16
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+from src.tools.ingest import AudioIngest
+
+
+def legacy_convert(audio_chunk: np.ndarray) -> np.ndarray:
+    # stream_fn before AudioIngest: mean, astype, divide and clip each allocate.
+    # Note mean() turned int16 stereo into float64, which then skipped scaling.
+    if audio_chunk.ndim > 1:
+        audio_chunk = audio_chunk.mean(axis=1)
+    if audio_chunk.dtype == np.int16:
+        audio_chunk = audio_chunk.astype(np.float32) / 32768.0
+    elif audio_chunk.dtype == np.int32:
+        audio_chunk = audio_chunk.astype(np.float32) / 2147483648.0
+    else:
+        audio_chunk = audio_chunk.astype(np.float32)
+    return np.clip(audio_chunk, -1.0, 1.0)
+
+
+def measure(fn, chunks):
+    # Transient bytes: peak traced memory during the call above what was live before it.
+    tracemalloc.start()
+    transient = []
+    for chunk in chunks:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+        transient.append(peak - before)
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        fn(chunk)
+    elapsed = time.perf_counter() - start
+    return float(np.mean(transient)), elapsed / len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=48_000)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--dtype', choices=('int16', 'int32', 'float32', 'float64'), default='int16')
+    parser.add_argument('--chunk', type=float, default=0.5)
+    parser.add_argument('--chunks', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (int(args.rate * args.chunk), args.channels) if args.channels > 1 else (int(args.rate * args.chunk),)
+    if args.dtype.startswith('int'):
+        info = np.iinfo(args.dtype)
+        chunks = [rng.integers(info.min // 4, info.max // 4, size=shape, dtype=args.dtype) for _ in range(args.chunks)]
+    else:
+        chunks = [rng.uniform(-0.5, 0.5, size=shape).astype(args.dtype) for _ in range(args.chunks)]
+
+    ingest = AudioIngest(sample_rate=16_000)
+    scale = 1.0 / -np.iinfo(args.dtype).min if args.dtype.startswith('int') else 1.0
+    for chunk in chunks[:3]:
+        expected = np.clip(chunk.reshape(shape[0], -1).astype(np.float64).mean(axis=1) * scale, -1.0, 1.0)
+        assert np.allclose(ingest.convert(chunk), expected, atol=1e-6)
+
+    print(f"chunk: {shape} {args.dtype} @ {args.rate} Hz")
+    print(f"{'path':<28} {'bytes/chunk':>12} {'us/chunk':>10}")
+    rows = [
+        ('legacy convert', legacy_convert),
+        ('AudioIngest.convert', ingest.convert),
+        ('AudioIngest.process', lambda chunk: ingest.process(args.rate, chunk)),
+    ]
+    for name, fn in rows:
+        transient, seconds = measure(fn, chunks)
+        print(f"{name:<28} {transient:>12,.0f} {seconds * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Replays WAV files or synthetic audio through StreamProcessor the way
+app.stream_fn feeds it, then reports per-stage latency percentiles, RTF,
+segments/sec and peak RSS. With --backend stub (the default) no model
+weights are needed.
+
+    python -m bench.replay --synthetic 120 --streams 4 --stub-rtf 0.2
+    python -m bench.replay talk.wav --realtime --backend canary --translator t5
+
+For a file talk.wav, talk.en.txt and talk.ru.txt next to it are used as
+reference transcripts for WER and BLEU.
+"""
+import os
+import json
+import time
+import argparse
+import functools
+import resource
+import threading
+import numpy as np
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from bench import stubs
+from bench.scoring import bleu, wer
+from bench.vad import synthetic_signal
+from src.tools.metrics import MetricsSink, metrics
+from src.tools.model_pool import ModelPool
+from src.tools.stream_porcessor import StreamProcessor, Transcription
+
+
+class CollectingSink(MetricsSink):
+    def __init__(self):
+        self.events: List[dict] = []
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        with self._lock:
+            self.events.append(event)
+
+    def summaries(self) -> Dict[Tuple[str, tuple], np.ndarray]:
+        grouped = defaultdict(list)
+        with self._lock:
+            for event in self.events:
+                if event['kind'] != 'summary':
+                    continue
+                labels = tuple(sorted((k, v) for k, v in event['labels'].items()))
+                grouped[(event['name'], labels)].append(event['value'])
+        return {key: np.asarray(values) for key, values in grouped.items()}
+
+    def counters(self, name: str) -> Dict[tuple, float]:
+        totals = defaultdict(float)
+        with self._lock:
+            for event in self.events:
+                if event['kind'] == 'counter' and event['name'] == name:
+                    labels = tuple(sorted((k, v) for k, v in event['labels'].items()))
+                    totals[labels] += event['value']
+        return dict(totals)
+
+
+def load_inputs(args) -> List[Tuple[str, int, np.ndarray]]:
+    inputs = []
+    for path in args.wav:
+        import soundfile as sf
+        audio, sr = sf.read(path, dtype=args.dtype)
+        inputs.append((path, sr, audio))
+    for i in range(args.streams if args.synthetic else 0):
+        audio = synthetic_signal(args.synthetic, args.input_rate, seed=i)
+        if args.dtype == 'int16':
+            audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        inputs.append((f"synthetic-{i}", args.input_rate, audio))
+    return inputs
+
+
+def replay(processor: StreamProcessor, sr: int, audio: np.ndarray, chunk: float, realtime: bool) -> List[Transcription]:
+    # Trailing silence so the last utterance reaches its endpoint.
+    tail = np.zeros((int(sr * 2.0),) + audio.shape[1:], dtype=audio.dtype)
+    audio = np.concatenate((audio, tail))
+    chunk_samples = int(sr * chunk)
+    results = []
+    start = time.perf_counter()
+
+    for offset in range(0, len(audio), chunk_samples):
+        if realtime:
+            delay = start + offset / sr - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        processor.process_audio(sr, audio[offset:offset + chunk_samples])
+        transcription = processor.get_transcribe()
+        while transcription:
+            results.append(transcription)
+            transcription = processor.get_transcribe()
+
+    processor.drain()
+    transcription = processor.get_transcribe()
+    while transcription:
+        results.append(transcription)
+        transcription = processor.get_transcribe()
+    return results
+
+
+def read_reference(path: str, lang: str) -> Optional[str]:
+    reference = f"{os.path.splitext(path)[0]}.{lang}.txt"
+    if not os.path.exists(reference):
+        return None
+    with open(reference, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('wav', nargs='*', help="WAV files, one stream each")
+    parser.add_argument('--synthetic', type=float, default=0.0, help="seconds of synthetic audio per stream")
+    parser.add_argument('--streams', type=int, default=1, help="concurrent synthetic streams")
+    parser.add_argument('--input-rate', type=int, default=16_000, help="sample rate of synthetic input")
+    parser.add_argument('--dtype', choices=('int16', 'float32'), default='int16', help="sample format handed to process_audio")
+    parser.add_argument('--chunk', type=float, default=0.5, help="chunk duration in seconds (gradio stream_every)")
+    parser.add_argument('--realtime', action='store_true', help="pace chunks at wall-clock speed instead of as fast as possible")
+    parser.add_argument('--backend', default='stub', help="ASR backend from the registry")
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--translator', choices=('stub', 't5'), default='stub')
+    parser.add_argument('--stub-rtf', type=float, default=0.0, help="simulated compute per second of audio for the stub")
+    parser.add_argument('--stub-hallucinate-below', type=float, default=0.0, help="RMS under which the stub answers 'Thank you.'")
+    parser.add_argument('--stub-seconds-per-word', type=float, default=0.0, help="simulated translation time for the stub")
+    parser.add_argument('--stream-translation', action='store_true', help="stream the translation word by word")
+    parser.add_argument('--partial-interval', type=float, default=None)
+    parser.add_argument('--speculative-silence', type=float, default=None, help="start ASR after this pause, e.g. 0.3")
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--max-wait', type=float, default=0.05)
+    parser.add_argument('--asr-processes', type=int, default=0, help="ASR worker processes, 0 decodes in-process")
+    parser.add_argument('--json', default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    inputs = load_inputs(args)
+    if not inputs:
+        parser.error("give WAV files or --synthetic SECONDS")
+
+    sink = metrics.add_sink(CollectingSink())
+    load_start = time.perf_counter()
+    pool = ModelPool(
+        asr_backend=args.backend,
+        asr_model=args.model,
+        asr_options={'rtf': args.stub_rtf, 'hallucinate_below': args.stub_hallucinate_below} if args.backend == 'stub' else None,
+        translator_factory=(
+            functools.partial(stubs.StubTranslator, seconds_per_word=args.stub_seconds_per_word)
+            if args.translator == 'stub' else None
+        ),
+        background=False,
+        warmup_duration=0.0 if args.backend == 'stub' else 1.0,
+        asr_max_batch_size=args.max_batch_size,
+        asr_max_wait=args.max_wait,
+        asr_processes=args.asr_processes,
+    )
+    load_seconds = time.perf_counter() - load_start
+
+    results: Dict[str, List[Transcription]] = {}
+
+    def run_stream(i: int, name: str, sr: int, audio: np.ndarray):
+        processor = StreamProcessor(
+            sample_rate=16_000,
+            model_pool=pool,
+            session_id=f"bench-{i}",
+            partial_interval=args.partial_interval,
+            speculative_silence=args.speculative_silence,
+            stream_translation=args.stream_translation,
+        )
+        results[name] = replay(processor, sr, audio, args.chunk, args.realtime)
+        processor.close()
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_stream, args=(i, name, sr, audio))
+        for i, (name, sr, audio) in enumerate(inputs)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    pool.close()
+
+    audio_seconds = sum(len(audio) / sr for _, sr, audio in inputs)
+    finals = {name: [t for t in rows if not t.is_partial and not t.translating and t.chunk_path] for name, rows in results.items()}
+    n_segments = sum(len(rows) for rows in finals.values())
+
+    report = {
+        'streams': len(inputs),
+        'audio_seconds': audio_seconds,
+        'wall_seconds': wall,
+        'model_load_seconds': load_seconds,
+        'rtf': wall / (audio_seconds / len(inputs)),
+        'segments': n_segments,
+        'segments_per_second': n_segments / wall,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'latency': {},
+    }
+    for (name, labels), values in sorted(sink.summaries().items()):
+        key = name + ''.join(f"[{k}={v}]" for k, v in labels)
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        report['latency'][key] = {'count': len(values), 'p50': p50, 'p90': p90, 'p99': p99, 'max': float(values.max())}
+
+    references_en, hypotheses_en, references_ru, hypotheses_ru = [], [], [], []
+    for name, rows in finals.items():
+        rows = sorted(rows, key=lambda t: t.segment_id)
+        reference_en, reference_ru = read_reference(name, 'en'), read_reference(name, 'ru')
+        if reference_en is not None:
+            references_en.append(reference_en)
+            hypotheses_en.append(' '.join(t.text_en for t in rows))
+        if reference_ru is not None:
+            references_ru.append(reference_ru)
+            hypotheses_ru.append(' '.join(t.text_ru for t in rows))
+    speculation = {dict(labels)['outcome']: n for labels, n in sink.counters('speculation_total').items()}
+    if speculation:
+        summaries = sink.summaries()
+        report['speculation'] = {
+            'hits': speculation.get('hit', 0),
+            'misses': speculation.get('miss', 0),
+            'busy': speculation.get('busy', 0),
+            'saved_seconds': float(summaries.get(('speculation_saved_seconds', ()), np.zeros(0)).sum()),
+            'wasted_seconds': float(summaries.get(('speculation_wasted_seconds', ()), np.zeros(0)).sum()),
+        }
+    filtered = {dict(labels)['reason']: n for labels, n in sink.counters('filtered_segments_total').items()}
+    if filtered:
+        report['filtered'] = filtered
+    if references_en:
+        report['wer'] = wer(references_en, hypotheses_en)
+    if references_ru:
+        report['bleu'] = bleu(references_ru, hypotheses_ru)
+
+    print(
+        f"streams={report['streams']} audio={audio_seconds:.1f}s wall={wall:.2f}s "
+        f"rtf={report['rtf']:.3f} segments={n_segments} ({report['segments_per_second']:.2f}/s) "
+        f"model_load={load_seconds:.2f}s peak_rss={report['peak_rss_mb']:.0f}MB"
+    )
+    if 'wer' in report:
+        print(f"WER={report['wer']:.3f}")
+    if 'bleu' in report:
+        print(f"BLEU={report['bleu']:.2f}")
+    if 'speculation' in report:
+        hits, misses = report['speculation']['hits'], report['speculation']['misses']
+        saved = report['latency'].get('speculation_saved_seconds', {})
+        print(
+            f"speculation: hits={hits:.0f} misses={misses:.0f} busy={report['speculation']['busy']:.0f} "
+            f"hit_rate={hits / max(hits + misses, 1):.2f} saved p50={saved.get('p50', 0.0):.3f}s "
+            f"saved={report['speculation']['saved_seconds']:.2f}s wasted={report['speculation']['wasted_seconds']:.2f}s"
+        )
+    if 'filtered' in report:
+        reasons = ' '.join(f"{reason}={n:.0f}" for reason, n in sorted(report['filtered'].items()))
+        print(f"filtered: {sum(report['filtered'].values()):.0f} segments, translator calls saved ({reasons})")
+    print(f"{'metric':<48} {'count':>7} {'p50':>10} {'p90':>10} {'p99':>10} {'max':>10}")
+    for key, stats in report['latency'].items():
+        print(f"{key:<48} {stats['count']:>7} {stats['p50']:>10.4f} {stats['p90']:>10.4f} {stats['p99']:>10.4f} {stats['max']:>10.4f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+CPU cost and chunk-boundary artifacts of the live resampling path.
+
+Compares per-chunk torchaudio.functional.resample (the old stream_fn path,
+skipped if torch is missing), per-chunk stateless soxr.resample and the
+per-session SOXRStreamAudioResampler. Artifacts are measured against the
+same method applied to the whole signal at once.
+
+    python -m bench.resample --in-rate 48000 --chunk 0.5
+"""
+import time
+import argparse
+import numpy as np
+import soxr
+
+from src.tools.soxr_stream_resampler import SOXRStreamAudioResampler
+
+
+def test_signal(seconds: float, rate: int) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    rng = np.random.default_rng(0)
+    signal = 0.4 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * 3150 * t) + 0.05 * rng.normal(size=len(t))
+    return signal.astype(np.float32)
+
+
+def chunked(fn, signal, chunk_samples):
+    outputs = []
+    start = time.process_time()
+    for offset in range(0, len(signal), chunk_samples):
+        outputs.append(fn(signal[offset:offset + chunk_samples], offset + chunk_samples >= len(signal)))
+    return np.concatenate(outputs), time.process_time() - start
+
+
+def boundary_error(output, reference, boundaries, radius=32):
+    n = min(len(output), len(reference))
+    error = np.abs(output[:n] - reference[:n])
+    near = np.zeros(n, dtype=bool)
+    for b in boundaries:
+        near[max(0, b - radius):min(n, b + radius)] = True
+    return float(error[near].max(initial=0.0)), float(error[~near].max(initial=0.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--in-rate', type=int, default=48_000)
+    parser.add_argument('--out-rate', type=int, default=16_000)
+    parser.add_argument('--chunk', type=float, default=0.5)
+    parser.add_argument('--quality', default='VHQ')
+    args = parser.parse_args()
+
+    signal = test_signal(args.seconds, args.in_rate)
+    chunk_samples = int(args.chunk * args.in_rate)
+    out_chunk = args.chunk * args.out_rate
+    boundaries = [int(round(i * out_chunk)) for i in range(1, int(args.seconds / args.chunk))]
+
+    methods = {}
+
+    try:
+        import torch
+        import torchaudio
+
+        def torchaudio_chunk(x, last):
+            return torchaudio.functional.resample(torch.tensor(x), orig_freq=args.in_rate, new_freq=args.out_rate).numpy()
+        reference = torchaudio.functional.resample(torch.tensor(signal), orig_freq=args.in_rate, new_freq=args.out_rate).numpy()
+        methods['torchaudio per chunk'] = (torchaudio_chunk, reference)
+    except ImportError:
+        print("[W] torch/torchaudio not installed, skipping the torchaudio baseline")
+
+    soxr_reference = soxr.resample(signal, args.in_rate, args.out_rate, quality=args.quality)
+    methods['soxr per chunk'] = (
+        lambda x, last: soxr.resample(x, args.in_rate, args.out_rate, quality=args.quality),
+        soxr_reference,
+    )
+
+    stream = SOXRStreamAudioResampler(dtype='float32', quality=args.quality)
+    methods['soxr stream (session)'] = (
+        lambda x, last: stream.resample(x, args.in_rate, args.out_rate, is_last=last),
+        soxr_reference,
+    )
+
+    print(f"{'method':<24} {'cpu s':>8} {'x realtime':>11} {'max err @edges':>15} {'max err inside':>15}")
+    for name, (fn, reference) in methods.items():
+        output, cpu = chunked(fn, signal, chunk_samples)
+        edge, inside = boundary_error(output, reference, boundaries)
+        print(f"{name:<24} {cpu:>8.3f} {args.seconds / cpu:>11.0f} {edge:>15.2e} {inside:>15.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import re
+from typing import List
+
+
+def normalize(text: str) -> List[str]:
+    return re.sub(r"[^\w\s']", ' ', text.casefold()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> int:
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def wer(references: List[str], hypotheses: List[str]) -> float:
+    errors = sum(word_errors(r, h) for r, h in zip(references, hypotheses))
+    words = sum(len(normalize(r)) for r in references)
+    return errors / words if words else 0.0
+
+
+def bleu(references: List[str], hypotheses: List[str]) -> float:
+    import sacrebleu
+    return sacrebleu.corpus_bleu(hypotheses, [references]).score
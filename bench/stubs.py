@@ -0,0 +1,94 @@
+"""Deterministic stand-ins for the ASR backends and Translator, no weights needed."""
+import time
+import hashlib
+import numpy as np
+from typing import Callable, List, Optional
+
+from src.tools.lru_cache import LRUCache
+from src.transcribe import registry
+
+_WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliett']
+
+
+class StubModel:
+    def __init__(
+        self,
+        model_name: str = 'stub',
+        load: bool = True,
+        rtf: float = 0.0,               # seconds of fake compute per second of audio
+        batch_overhead: float = 0.0,    # fixed seconds per transcribe_batch call
+        sample_rate: int = 16_000,
+        quantize: bool = False,         # accepted like the real backends, changes nothing
+        hallucinate_below: float = 0.0, # RMS under which a segment decodes to "Thank you.", like Whisper on noise
+    ):
+        self.model_name = model_name
+        self.hallucinate_below = hallucinate_below
+        self.quantize = quantize
+        self.rtf = rtf
+        self.batch_overhead = batch_overhead
+        self.sample_rate = sample_rate
+        self.calls = 0
+
+    def load_model(self, model_name: str):
+        self.model_name = model_name
+
+    def unload_model(self):
+        pass
+
+    def transcribe(self, speech_array: np.ndarray) -> str:
+        return self.transcribe_batch([speech_array])[0]
+
+    def transcribe_batch(self, speech_arrays: List[np.ndarray]) -> List[str]:
+        self.calls += 1
+        # A batch costs its longest item, like a padded model call.
+        longest = max(len(speech_array) for speech_array in speech_arrays) / self.sample_rate
+        time.sleep(self.batch_overhead + self.rtf * longest)
+        return [self._text(speech_array) for speech_array in speech_arrays]
+
+    def _text(self, speech_array: np.ndarray) -> str:
+        if self.hallucinate_below and np.sqrt(np.mean(np.square(speech_array, dtype=np.float32))) < self.hallucinate_below:
+            return "Thank you."
+        # Roughly two words per second, picked from a hash of the samples.
+        digest = hashlib.blake2b(np.ascontiguousarray(speech_array).tobytes(), digest_size=16).digest()
+        n_words = max(1, int(2 * len(speech_array) / self.sample_rate))
+        return ' '.join(_WORDS[digest[i % len(digest)] % len(_WORDS)] for i in range(n_words))
+
+
+class StubTranslator:
+    def __init__(
+        self,
+        source: str = 'en',
+        target: str = 'ru',
+        max_batch_size: int = 16,
+        cache_size: int = 4096,
+        cache_path: Optional[str] = None,
+        seconds_per_word: float = 0.0,
+    ):
+        self.model_name = 'stub-translator'
+        self.target = target
+        self.max_batch_size = max_batch_size
+        self.seconds_per_word = seconds_per_word
+        self.cache = LRUCache(max_entries=cache_size, path=cache_path)
+
+    def translate(self, text: str) -> str:
+        return self.translate_batch([text])[0]
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        time.sleep(self.seconds_per_word * max((len(text.split()) for text in texts), default=0))
+        return [f"[{self.target}] {text}" for text in texts]
+
+    def translate_stream(self, text: str, on_text: Callable[[str], None]) -> str:
+        words = [f"[{self.target}]"] + text.split()
+        for i in range(1, len(words) + 1):
+            time.sleep(self.seconds_per_word)
+            on_text(' '.join(words[:i]))
+        return ' '.join(words)
+
+    def warmup(self):
+        pass
+
+    def close(self):
+        self.cache.close()
+
+
+registry.register_backend('stub', 'bench.stubs', 'StubModel', 'stub')
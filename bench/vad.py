@@ -0,0 +1,147 @@
+"""
+Compares VoiceDetector.process_chunk with the original frame-by-frame loop
+on synthetic signals and reports throughput of both. Segments must match
+sample for sample, except that the original holds the onset frame twice.
+
+    python -m bench.vad --seconds 600 --chunk 0.5
+"""
+import time
+import argparse
+import numpy as np
+
+from src.tools.voice_detector import VoiceDetector
+
+
+class LegacyVoiceDetector:
+    """Frame-by-frame reference kept only to check segment boundaries."""
+
+    def __init__(self, sample_rate, frame_duration, energy_threshold, min_silence_duration, on_speech_end):
+        self.sample_rate = sample_rate
+        self.on_speech_end_fn = on_speech_end
+        self.frame_samples = int(sample_rate * frame_duration)
+        self.energy_threshold = energy_threshold
+        self.min_silence_samples = int(sample_rate * min_silence_duration)
+        self.overlap_samples = self.min_silence_samples // 2
+        self.utterance_buffer = np.array([], dtype=np.float32)
+        self.pending_buffer = np.array([], dtype=np.float32)
+        self.silence_buffer = np.array([], dtype=np.float32)
+        self.current_state = 'silence'
+        self.consecutive_silence_samples = 0
+
+    def process_chunk(self, chunk):
+        chunk = np.concatenate((self.pending_buffer, chunk))
+        self.pending_buffer = np.array([], dtype=np.float32)
+
+        while len(chunk) >= self.frame_samples:
+            frame = chunk[:self.frame_samples]
+            chunk = chunk[self.frame_samples:]
+            energy = np.sqrt(np.mean(frame**2))
+            is_speech = energy > self.energy_threshold
+
+            if self.current_state == 'silence':
+                self.silence_buffer = np.concatenate((self.silence_buffer, frame))
+                if len(self.silence_buffer) > self.overlap_samples:
+                    self.silence_buffer = self.silence_buffer[-self.overlap_samples:]
+                if is_speech:
+                    self.current_state = 'speech'
+                    self.utterance_buffer = np.concatenate((self.silence_buffer, frame))
+                    self.silence_buffer = np.array([], dtype=np.float32)
+                    self.consecutive_silence_samples = 0
+            else:
+                self.utterance_buffer = np.concatenate((self.utterance_buffer, frame))
+                if is_speech:
+                    self.consecutive_silence_samples = 0
+                else:
+                    self.consecutive_silence_samples += self.frame_samples
+                    if self.consecutive_silence_samples >= self.min_silence_samples:
+                        trim_samples = self.consecutive_silence_samples - self.overlap_samples
+                        if trim_samples > 0:
+                            utterance = self.utterance_buffer[:-trim_samples]
+                        else:
+                            utterance = self.utterance_buffer.copy()
+                        self.on_speech_end_fn(utterance, len(utterance) / self.sample_rate)
+                        remaining_silence = self.utterance_buffer[-trim_samples:] if trim_samples > 0 else np.array([], dtype=np.float32)
+                        self.silence_buffer = remaining_silence.copy()
+                        self.current_state = 'silence'
+                        self.consecutive_silence_samples = 0
+                        self.utterance_buffer = np.array([], dtype=np.float32)
+
+        self.pending_buffer = chunk
+
+
+def synthetic_signal(seconds: float, sample_rate: int, seed: int) -> np.ndarray:
+    # Alternating bursts of loud noise and near-silence of random lengths,
+    # including pauses just around min_silence_duration.
+    rng = np.random.default_rng(seed)
+    parts = []
+    total = 0
+    n_total = int(seconds * sample_rate)
+    while total < n_total:
+        speech = int(rng.uniform(0.05, 12.0) * sample_rate)
+        pause = int(rng.choice([rng.uniform(0.0, 0.5), rng.uniform(1.3, 1.7), rng.uniform(1.5, 6.0)]) * sample_rate)
+        parts.append(rng.normal(0, rng.uniform(0.005, 0.2), speech))
+        parts.append(rng.normal(0, 0.002, pause))
+        total += speech + pause
+    return np.concatenate(parts)[:n_total].astype(np.float32)
+
+
+def matches_legacy(legacy: np.ndarray, current: np.ndarray, frame_samples: int) -> bool:
+    # The one intended difference: the legacy loop appended the onset frame to
+    # a silence buffer that already ended with it, so its utterances hold that
+    # frame twice. Everything else must be sample-identical.
+    if len(legacy) != len(current) + frame_samples:
+        return False
+    mismatch = np.flatnonzero(legacy[:len(current)] != current)
+    k = int(mismatch[0]) if len(mismatch) else len(current)
+    if k < frame_samples or not np.array_equal(legacy[k - frame_samples:k], legacy[k:k + frame_samples]):
+        return False
+    return np.array_equal(np.concatenate((legacy[:k], legacy[k + frame_samples:])), current)
+
+
+def run(detector_cls, signal, chunk_samples, **options):
+    segments = []
+    detector = detector_cls(on_speech_end=lambda audio, duration: segments.append(np.array(audio)), **options)
+    start = time.perf_counter()
+    for offset in range(0, len(signal), chunk_samples):
+        detector.process_chunk(signal[offset:offset + chunk_samples])
+    return segments, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=300.0)
+    parser.add_argument('--chunk', type=float, default=0.5, help="chunk duration in seconds (gradio stream_every)")
+    parser.add_argument('--sample-rate', type=int, default=16_000)
+    parser.add_argument('--seeds', type=int, default=3)
+    args = parser.parse_args()
+
+    options = dict(
+        sample_rate=args.sample_rate,
+        frame_duration=0.03,
+        energy_threshold=0.01,
+        min_silence_duration=1.5,
+    )
+    chunk_samples = int(args.chunk * args.sample_rate)
+
+    for seed in range(args.seeds):
+        signal = synthetic_signal(args.seconds, args.sample_rate, seed)
+        legacy, legacy_time = run(LegacyVoiceDetector, signal, chunk_samples, **options)
+        # The original kept utterances of any length, so the memory cap is lifted to match.
+        current, current_time = run(VoiceDetector, signal, chunk_samples, max_buffer_duration=args.seconds, **options)
+
+        frame_samples = int(options['frame_duration'] * args.sample_rate)
+        identical = len(legacy) == len(current) and all(
+            matches_legacy(a, b, frame_samples) for a, b in zip(legacy, current)
+        )
+        print(
+            f"seed={seed} segments={len(current)} identical={identical} "
+            f"legacy={len(signal) / legacy_time:,.0f} samples/s "
+            f"vectorized={len(signal) / current_time:,.0f} samples/s "
+            f"speedup={legacy_time / current_time:.1f}x"
+        )
+        if not identical:
+            raise SystemExit(f"[E] Segment boundaries differ from the legacy detector (seed={seed})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Counts the utterances the energy VAD alone would send to ASR on a noisy
+corpus against the energy gate plus a SpeechScorer, i.e. the ASR calls a
+neural VAD saves and the speech it loses.
+
+The corpus interleaves speech with keyboard click trains and fan noise that
+are loud enough to pass the energy threshold. Speech is synthetic
+harmonics unless --speech points at a clean recording, which is cut into
+pieces; MarbleNet only recognises the latter.
+
+    python -m bench.vad_gate --scorer oracle
+    python -m bench.vad_gate --scorer marblenet --speech talk.wav --seconds 600
+"""
+import time
+import argparse
+import numpy as np
+from typing import List, Optional, Tuple
+
+from src.tools.speech_scorer import SpeechScorer
+from src.tools.voice_detector import VoiceDetector
+
+# Utterances shorter than this never reach ASR, see StreamProcessor._on_speech_end.
+MIN_UTTERANCE = 0.5
+
+
+def _find(signal: np.ndarray, probe: np.ndarray, start: int) -> int:
+    # Position of probe in signal at or after start; samples are random
+    # floats, so an exact match is unique.
+    for i in np.flatnonzero(signal[start:] == probe[0]):
+        if np.array_equal(signal[start + i:start + i + len(probe)], probe):
+            return start + int(i)
+    return -1
+
+
+class OracleScorer(SpeechScorer):
+    """Scores frames from the corpus labels, an upper bound for any model."""
+
+    def __init__(self, signal: np.ndarray, labels: np.ndarray):
+        self.signal = signal
+        self.labels = labels
+        self._position = 0
+
+    def score(self, frames: np.ndarray) -> np.ndarray:
+        start = _find(self.signal, frames[0], self._position)
+        self._position = start + frames.size
+        return self.labels[start:self._position].reshape(frames.shape).mean(axis=1)
+
+
+def speech_bursts(rng, sample_rate: int, source: Optional[np.ndarray]):
+    # A clean recording is cut at random offsets, otherwise voiced harmonics
+    # with a syllable-rate envelope stand in for speech.
+    n = int(rng.uniform(1.0, 6.0) * sample_rate)
+    if source is not None:
+        offset = int(rng.integers(0, max(1, len(source) - n)))
+        audio = source[offset:offset + n]
+        frame = int(0.03 * sample_rate)
+        usable = len(audio) // frame * frame
+        rms = np.sqrt(np.mean(audio[:usable].reshape(-1, frame) ** 2, axis=1))
+        labels = np.repeat(rms > 0.01, frame)
+        return audio[:usable], labels.astype(np.float32)
+
+    t = np.arange(n) / sample_rate
+    f0 = rng.uniform(100, 220) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(0.5, 2.0) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.abs(np.sin(2 * np.pi * rng.uniform(3.0, 5.0) * t)) ** 0.5
+    audio = rng.uniform(0.05, 0.15) * voiced * envelope / np.sqrt(np.mean(voiced ** 2))
+    return audio, (envelope > 0.2).astype(np.float32)
+
+
+def clicks(rng, sample_rate: int):
+    n = int(rng.uniform(0.5, 3.0) * sample_rate)
+    audio = np.zeros(n)
+    decay = np.exp(-np.arange(int(0.005 * sample_rate)) / (0.001 * sample_rate))
+    for at in rng.integers(0, n - len(decay), size=max(1, int(8 * n / sample_rate))):
+        audio[at:at + len(decay)] += rng.uniform(0.1, 0.5) * rng.normal(size=len(decay)) * decay
+    return audio, np.zeros(n, dtype=np.float32)
+
+
+def fan(rng, sample_rate: int):
+    n = int(rng.uniform(2.0, 6.0) * sample_rate)
+    # One-pole low-pass as a truncated impulse response, fans are mostly rumble.
+    rumble = np.convolve(rng.normal(size=n), 0.97 ** np.arange(256), mode='same')
+    rumble *= rng.uniform(0.015, 0.04) / np.sqrt(np.mean(rumble ** 2))
+    return rumble, np.zeros(n, dtype=np.float32)
+
+
+def noisy_corpus(seconds: float, sample_rate: int, seed: int, source: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    parts, labels = [], []
+    total = 0
+    n_total = int(seconds * sample_rate)
+    while total < n_total:
+        kind = rng.choice(['speech', 'clicks', 'fan'], p=[0.5, 0.25, 0.25])
+        if kind == 'speech':
+            audio, label = speech_bursts(rng, sample_rate, source)
+        elif kind == 'clicks':
+            audio, label = clicks(rng, sample_rate)
+        else:
+            audio, label = fan(rng, sample_rate)
+        pause = int(rng.uniform(0.3, 3.0) * sample_rate)
+        parts += [audio, np.zeros(pause)]
+        labels += [label, np.zeros(pause, dtype=np.float32)]
+        total += len(audio) + pause
+
+    signal = np.concatenate(parts)[:n_total]
+    signal += rng.normal(0, 0.002, len(signal))     # room tone, also makes every sample unique
+    return signal.astype(np.float32), np.concatenate(labels)[:n_total]
+
+
+def run(signal: np.ndarray, labels: np.ndarray, chunk_samples: int, scorer: Optional[SpeechScorer], **options) -> dict:
+    utterances: List[np.ndarray] = []
+    detector = VoiceDetector(on_speech_end=lambda audio, duration: utterances.append(np.array(audio)), scorer=scorer, **options)
+    start = time.perf_counter()
+    for offset in range(0, len(signal), chunk_samples):
+        detector.process_chunk(signal[offset:offset + chunk_samples])
+    elapsed = time.perf_counter() - start
+
+    sample_rate = detector.sample_rate
+    covered = np.zeros(len(signal), dtype=bool)
+    asr_calls = junk = 0
+    position = 0
+    for utterance in utterances:
+        if len(utterance) < MIN_UTTERANCE * sample_rate:
+            continue
+        asr_calls += 1
+        # The tail is never the duplicated onset frame, so it locates the utterance.
+        tail = utterance[-min(len(utterance), 4096):]
+        end = _find(signal, tail, position) + len(tail)
+        position = end
+        begin = max(0, end - len(utterance))
+        covered[begin:end] = True
+        if labels[begin:end].sum() < 0.2 * sample_rate:
+            junk += 1
+
+    speech = labels > 0.5
+    return {
+        'asr_calls': asr_calls,
+        'junk_calls': junk,
+        'speech_recall': float(covered[speech].mean()) if speech.any() else 1.0,
+        'frames_scored': detector.frames_scored / max(detector.frames_total, 1),
+        'seconds': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scorer', choices=('oracle', 'marblenet'), default='oracle')
+    parser.add_argument('--speech', default=None, help="clean speech recording to build the corpus from")
+    parser.add_argument('--seconds', type=float, default=300.0)
+    parser.add_argument('--chunk', type=float, default=0.5, help="chunk duration in seconds (gradio stream_every)")
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--speech-threshold', type=float, default=0.6)
+    parser.add_argument('--silence-threshold', type=float, default=0.4)
+    parser.add_argument('--pre-roll', type=float, default=None)
+    parser.add_argument('--post-roll', type=float, default=None)
+    args = parser.parse_args()
+
+    sample_rate = 16_000
+    source = None
+    if args.speech:
+        import soundfile as sf
+        from src.tools.ingest import AudioIngest
+        audio, sr = sf.read(args.speech, dtype='float32')
+        source = np.array(AudioIngest(sample_rate=sample_rate).process(sr, audio))
+    marblenet = None
+    if args.scorer == 'marblenet':
+        from src.tools.speech_scorer import MarbleNetScorer
+        marblenet = MarbleNetScorer(sample_rate=sample_rate)
+
+    # Same settings StreamProcessor uses.
+    options = dict(
+        sample_rate=sample_rate,
+        frame_duration=0.03,
+        energy_threshold=0.01,
+        min_silence_duration=1.5,
+        speech_threshold=args.speech_threshold,
+        silence_threshold=args.silence_threshold,
+        pre_roll=args.pre_roll,
+        post_roll=args.post_roll,
+    )
+    chunk_samples = int(args.chunk * sample_rate)
+    totals = {'energy': 0, 'gated': 0}
+
+    print(f"{'seed':>4} {'vad':>7} {'asr calls':>10} {'junk':>6} {'speech recall':>14} {'scored':>8} {'time':>8}")
+    for seed in range(args.seeds):
+        signal, labels = noisy_corpus(args.seconds, sample_rate, seed, source)
+        scorer = marblenet or OracleScorer(signal, labels)
+        for name, vad_scorer in (('energy', None), ('gated', scorer)):
+            report = run(signal, labels, chunk_samples, vad_scorer, **options)
+            totals[name] += report['asr_calls']
+            print(
+                f"{seed:>4} {name:>7} {report['asr_calls']:>10} {report['junk_calls']:>6} "
+                f"{report['speech_recall']:>14.3f} {report['frames_scored']:>8.1%} {report['seconds']:>7.2f}s"
+            )
+
+    saved = totals['energy'] - totals['gated']
+    print(f"ASR calls saved by {args.scorer}: {saved} of {totals['energy']} ({saved / max(totals['energy'], 1):.1%})")
+
+
+if __name__ == '__main__':
+    main()
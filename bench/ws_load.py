@@ -0,0 +1,101 @@
+"""
+Load generator for server.py: opens N concurrent connections that each
+stream synthetic audio in small frames at real-time pace. Reports how far
+senders fell behind real time, the delay from stop to done and message
+counts; per-utterance latency is the server's e2e_latency_seconds metric
+(run it with METRICS_PORT set).
+
+    python server.py --backend stub &
+    python -m bench.ws_load --connections 50 --seconds 60
+"""
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from typing import Dict, List
+
+from websockets.asyncio.client import connect
+
+from bench.vad import synthetic_signal
+
+
+async def run_connection(url: str, i: int, args, results: Dict[str, List[float]]):
+    audio = synthetic_signal(args.seconds, args.sample_rate, seed=i)
+    audio = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    frame_samples = int(args.sample_rate * args.frame)
+    # Staggered starts, so utterance ends don't line up across connections.
+    await asyncio.sleep(i * args.ramp / max(args.connections, 1))
+
+    stopped_at = 0.0
+    async with connect(args.url) as websocket:
+        await websocket.send(json.dumps({'type': 'start', 'sample_rate': args.sample_rate, 'format': 's16le'}))
+        await websocket.recv()
+
+        async def send():
+            start = time.perf_counter()
+            for offset in range(0, len(audio), frame_samples):
+                delay = start + offset / args.sample_rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await websocket.send(audio[offset:offset + frame_samples].tobytes())
+            results['send_lag'].append(time.perf_counter() - start - len(audio) / args.sample_rate)
+            nonlocal stopped_at
+            stopped_at = time.perf_counter()
+            await websocket.send(json.dumps({'type': 'stop'}))
+
+        sender = asyncio.create_task(send())
+        received = 0
+        async for message in websocket:
+            result = json.loads(message)
+            received += 1
+            if result['type'] == 'done':
+                results['drain'].append(time.perf_counter() - stopped_at)
+                break
+            if result['type'] == 'final':
+                results['finals'].append(time.perf_counter())
+            elif result['type'] == 'partial':
+                results['partials'].append(time.perf_counter())
+        await sender
+        results['messages'].append(received)
+
+
+async def main_async(args):
+    results: Dict[str, List[float]] = {'finals': [], 'partials': [], 'messages': [], 'send_lag': [], 'drain': [], 'errors': []}
+
+    async def guarded(i: int):
+        try:
+            await run_connection(args.url, i, args, results)
+        except Exception as e:
+            results['errors'].append(1)
+            print(f"[E] Connection {i} failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(guarded(i) for i in range(args.connections)))
+    wall = time.perf_counter() - start
+
+    send_lag = np.asarray(results['send_lag'] or [0.0])
+    drain = np.asarray(results['drain'] or [0.0])
+    print(
+        f"connections={args.connections} failed={len(results['errors'])} wall={wall:.1f}s "
+        f"finals={len(results['finals'])} partials={len(results['partials'])} "
+        f"messages={sum(results['messages'])}"
+    )
+    print(f"sender lag behind real time: p50={np.percentile(send_lag, 50):.3f}s max={send_lag.max():.3f}s")
+    print(f"stop -> done: p50={np.percentile(drain, 50):.3f}s p99={np.percentile(drain, 99):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='ws://localhost:8765')
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=30.0, help="audio per connection")
+    parser.add_argument('--sample-rate', type=int, default=8_000, help="telephony rate by default")
+    parser.add_argument('--frame', type=float, default=0.02)
+    parser.add_argument('--ramp', type=float, default=2.0, help="seconds over which connections start")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
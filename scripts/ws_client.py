@@ -0,0 +1,65 @@
+"""
+Streams a WAV file to server.py in 20ms frames at real-time pace and
+prints partial and final results as they arrive.
+
+    python scripts/ws_client.py talk.wav --url ws://localhost:8765
+"""
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import soundfile as sf
+from websockets.asyncio.client import connect
+
+
+async def stream_file(url: str, path: str, frame: float, realtime: bool):
+    audio, sample_rate = sf.read(path, dtype='int16', always_2d=True)
+    frame_samples = int(sample_rate * frame)
+
+    async with connect(url) as websocket:
+        await websocket.send(json.dumps({
+            'type': 'start',
+            'sample_rate': sample_rate,
+            'format': 's16le',
+            'channels': audio.shape[1],
+        }))
+        ready = json.loads(await websocket.recv())
+        print(f"[I] Session {ready['session_id']}")
+
+        async def send():
+            start = time.perf_counter()
+            for offset in range(0, len(audio), frame_samples):
+                if realtime:
+                    delay = start + offset / sample_rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await websocket.send(np.ascontiguousarray(audio[offset:offset + frame_samples]).tobytes())
+            await websocket.send(json.dumps({'type': 'stop'}))
+
+        sender = asyncio.create_task(send())
+        async for message in websocket:
+            result = json.loads(message)
+            if result['type'] == 'done':
+                break
+            if result['type'] == 'partial':
+                print(f"  … [{result['segment_id']}] {result['text_en']}")
+            elif result['type'] == 'translating' and not result['text_ru']:
+                print(f"[{result['segment_id']}] {result['duration']:.2f}s {result['text_en']}")
+            elif result['type'] == 'final':
+                print(f"      [{result['segment_id']}] {result['text_ru']}")
+        await sender
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('wav')
+    parser.add_argument('--url', default='ws://localhost:8765')
+    parser.add_argument('--frame', type=float, default=0.02, help="seconds of audio per message")
+    parser.add_argument('--fast', action='store_true', help="send as fast as possible instead of real time")
+    args = parser.parse_args()
+    asyncio.run(stream_file(args.url, args.wav, args.frame, not args.fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Headless streaming transcription over WebSocket, without gradio.
+
+A client opens a connection, sends one JSON text message declaring its
+audio, then raw PCM frames as binary messages (20ms frames are fine):
+
+    {"type": "start", "sample_rate": 8000, "format": "s16le", "channels": 1,
+     "session_id": "optional", "partials": true}
+
+session_id may use letters, digits, '_' and '-' (up to 64), any other
+value gets a fresh id; an id with a live connection is refused.
+
+The server answers {"type": "ready", "session_id": ...} and then streams
+JSON results as they are published:
+
+    {"type": "partial" | "translating" | "final" | "retract", "segment_id": 3,
+     "duration": 2.41, "text_en": "...", "text_ru": "..."}
+
+"translating" carries the final English as soon as ASR is done, with the
+Russian still empty (or growing, with --stream-translation); "final"
+completes the same segment.
+
+{"type": "stop"} flushes the utterance in progress, sends the remaining
+results and {"type": "done"}, then closes. Any other malformed text message
+is answered with {"type": "error", "message": ...}. Binary frames need not
+hold whole samples; the rest is carried into the next frame.
+
+    python server.py --port 8765
+    python server.py --backend stub      # no weights, for load tests
+    python server.py --local-model-copy --profile-startup   # where a restart spends its time
+"""
+import sys
+from src.tools.startup_profile import StartupProfile
+# Installed ahead of the other imports so they are timed too.
+_profile = StartupProfile().install() if '--profile-startup' in sys.argv else None
+
+import os
+import re
+import json
+import uuid
+import asyncio
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from src.tools import model_cache
+from src.tools.model_pool import ModelPool
+from src.tools.stream_porcessor import StreamProcessor, Transcription
+from src.tools.transcript_cache import TranscriptCache
+from src.tools.transcript_filter import TranscriptFilter, load_blocklist
+from src.tools.metrics import metrics, JsonlSink, PrometheusSink
+
+FORMATS = {'s16le': np.dtype('<i2'), 's32le': np.dtype('<i4'), 'f32le': np.dtype('<f4')}
+# Session ids name a directory under ./sessions, anything else gets a fresh uuid.
+SESSION_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+class TranscriptionServer:
+    def __init__(
+        self,
+        models: ModelPool,
+        transcript_cache: Optional[TranscriptCache] = None,
+        ingest_workers: int = os.cpu_count() or 4,   # resampling and VAD, off the event loop
+        partial_interval: Optional[float] = 1.0,
+        poll_interval: float = 0.02,                 # seconds between checks for new results
+        max_connections: int = 256,
+        speculative_silence: Optional[float] = None,  # start ASR at a short pause, see StreamProcessor
+        stream_translation: bool = False,
+        transcript_filter: Optional[TranscriptFilter] = None,  # shared by all sessions, None applies the defaults
+    ):
+        self.models = models
+        self.transcript_cache = transcript_cache
+        self.partial_interval = partial_interval
+        self.speculative_silence = speculative_silence
+        self.stream_translation = stream_translation
+        self.transcript_filter = transcript_filter
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=ingest_workers, thread_name_prefix='ingest')
+        self._slots = asyncio.Semaphore(max_connections)
+        self._sessions = set()      # ids of live connections, one writer per session directory
+        self.connections = 0
+
+    async def handle(self, websocket: ServerConnection):
+        if self._slots.locked():
+            await websocket.close(code=1013, reason="server busy")
+            return
+        async with self._slots:
+            self.connections += 1
+            metrics.gauge('connections', self.connections)
+            try:
+                await self._session(websocket)
+            except ConnectionClosed:
+                pass
+            finally:
+                self.connections -= 1
+                metrics.gauge('connections', self.connections)
+
+    async def _session(self, websocket: ServerConnection):
+        try:
+            config = json.loads(await websocket.recv())
+            if config.get('type') != 'start':
+                raise ValueError("first message must be {\"type\": \"start\", ...}")
+            sample_rate = int(config['sample_rate'])
+            dtype = FORMATS[config.get('format', 's16le')]
+            channels = int(config.get('channels', 1))
+            if sample_rate <= 0 or channels <= 0:
+                raise ValueError("sample_rate and channels must be positive")
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            await websocket.send(json.dumps({'type': 'error', 'message': f"bad start message: {e}"}))
+            await websocket.close(code=1003)
+            return
+
+        session_id = config.get('session_id')
+        if not isinstance(session_id, str) or not SESSION_ID.fullmatch(session_id):
+            session_id = uuid.uuid4().hex
+        if session_id in self._sessions:
+            await websocket.send(json.dumps({'type': 'error', 'message': f"session '{session_id}' is already connected"}))
+            await websocket.close(code=1008)
+            return
+        # Claimed before the first await, so a second connection with this id sees it.
+        self._sessions.add(session_id)
+        try:
+            await self._stream(websocket, session_id, config, sample_rate, dtype, channels)
+        finally:
+            self._sessions.discard(session_id)
+
+    async def _stream(self, websocket: ServerConnection, session_id: str, config: dict, sample_rate: int, dtype: np.dtype, channels: int):
+        loop = asyncio.get_running_loop()
+        processor = await loop.run_in_executor(self._executor, lambda: StreamProcessor(
+            sample_rate=16_000,
+            model_pool=self.models,
+            session_id=session_id,
+            transcript_cache=self.transcript_cache,
+            partial_interval=self.partial_interval if config.get('partials', True) else None,
+            speculative_silence=self.speculative_silence,
+            stream_translation=self.stream_translation,
+            transcript_filter=self.transcript_filter,
+        ))
+        await websocket.send(json.dumps({'type': 'ready', 'session_id': session_id}))
+        print(f"[I] Connection '{session_id}' started: {sample_rate} Hz {config.get('format', 's16le')} x{channels}")
+
+        stopped = asyncio.Event()
+        sender = asyncio.create_task(self._send_results(websocket, processor, stopped))
+        frame_bytes = dtype.itemsize * channels
+        leftover = b""      # a sample or channel group split across two messages
+        try:
+            async for message in websocket:
+                if isinstance(message, str):
+                    try:
+                        control = json.loads(message)
+                        kind = control.get('type') if isinstance(control, dict) else None
+                    except ValueError as e:
+                        await websocket.send(json.dumps({'type': 'error', 'message': f"bad control message: {e}"}))
+                        continue
+                    if kind == 'stop':
+                        break
+                    if kind is None:
+                        await websocket.send(json.dumps({'type': 'error', 'message': "control messages are JSON objects with a 'type'"}))
+                    continue
+                data = leftover + message if leftover else message
+                usable = len(data) // frame_bytes * frame_bytes
+                leftover = bytes(data[usable:])
+                if usable == 0:
+                    continue
+                audio = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize)
+                if channels > 1:
+                    audio = audio.reshape(-1, channels)
+                # Frames of one connection are processed in order, connections in parallel.
+                await loop.run_in_executor(self._executor, processor.process_audio, sample_rate, audio)
+
+            # Trailing silence closes the utterance in progress, then wait for its result.
+            silence = np.zeros(int(processor.sample_rate * 2.0), dtype=np.float32)
+            await loop.run_in_executor(self._executor, processor.process_chunk, silence)
+            await loop.run_in_executor(self._executor, processor.drain)
+            stopped.set()
+            await sender
+            await self._flush(websocket, processor)
+            await websocket.send(json.dumps({'type': 'done'}))
+        finally:
+            stopped.set()
+            sender.cancel()
+            await loop.run_in_executor(self._executor, processor.close)
+            print(f"[I] Connection '{session_id}' closed")
+
+    async def _send_results(self, websocket: ServerConnection, processor: StreamProcessor, stopped: asyncio.Event):
+        while not stopped.is_set():
+            await self._flush(websocket, processor)
+            try:
+                await asyncio.wait_for(stopped.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self, websocket: ServerConnection, processor: StreamProcessor):
+        transcription = processor.get_transcribe()
+        while transcription:
+            await websocket.send(json.dumps(self._message(transcription), ensure_ascii=False))
+            transcription = processor.get_transcribe()
+
+    @staticmethod
+    def _message(transcription: Transcription) -> dict:
+        if transcription.is_partial:
+            kind = 'partial'
+        elif transcription.translating:
+            kind = 'translating'
+        elif transcription.chunk_path:
+            kind = 'final'
+        else:
+            kind = 'retract'
+        return {
+            'type': kind,
+            'segment_id': transcription.segment_id,
+            'duration': round(transcription.duration, 3),
+            'text_en': transcription.text_en,
+            'text_ru': transcription.text_ru,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--backend', default=os.environ.get('ASR_BACKEND', 'canary'))
+    parser.add_argument('--model', default=os.environ.get('ASR_MODEL') or None)
+    parser.add_argument('--partial-interval', type=float, default=1.0, help="0 disables partials")
+    parser.add_argument('--max-connections', type=int, default=256)
+    parser.add_argument('--stream-translation', action='store_true', help="send the translation word by word")
+    parser.add_argument('--speculative-silence', type=float, default=0.0, help="seconds of pause that start ASR early, 0 disables")
+    parser.add_argument('--blocklist', default=os.environ.get('HALLUCINATION_BLOCKLIST'), help="file of hallucinated phrases, one per line, dropped from short or quiet segments")
+    parser.add_argument('--ingest-workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--quantize', action='store_true', help="int8 dynamic quantization for CPU inference")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--interop-threads', type=int, default=None, help="torch inter-op threads")
+    parser.add_argument('--asr-processes', type=int, default=0, help="ASR worker processes, 0 decodes in-process")
+    parser.add_argument('--threads-per-process', type=int, default=None, help="torch threads in each ASR worker")
+    parser.add_argument('--model-cache-dir', default=None, help="downloads and saved weights; default $MODEL_CACHE_DIR, else the libraries' own caches")
+    parser.add_argument('--local-model-copy', action='store_true', help="save loaded models under the cache dir and load them from there next start")
+    parser.add_argument('--profile-startup', action='store_true', help="print import and model load times once models are ready")
+    args = parser.parse_args()
+    cache_root = model_cache.configure(args.model_cache_dir)
+    if os.environ.get('MODEL_CACHE_DIR') or args.local_model_copy:
+        print(f"[I] Model cache: {cache_root}")
+
+    if os.environ.get('METRICS_PORT'):
+        metrics.add_sink(PrometheusSink()).serve(port=int(os.environ['METRICS_PORT']))
+    if os.environ.get('METRICS_JSONL'):
+        metrics.add_sink(JsonlSink(os.environ['METRICS_JSONL']))
+
+    translator_factory = None
+    model_options = {}
+    if args.backend == 'stub':
+        from bench import stubs     # registers the 'stub' backend, no weights needed
+        translator_factory = stubs.StubTranslator
+    else:
+        if args.quantize:
+            model_options['quantize'] = True
+        if args.local_model_copy:
+            model_options['local_copy'] = True
+
+    models = ModelPool(
+        asr_backend=args.backend,
+        asr_model=args.model,
+        asr_options=model_options,
+        translator_factory=translator_factory,
+        translator_options=model_options,
+        intra_op_threads=args.threads,
+        inter_op_threads=args.interop_threads,
+        asr_processes=args.asr_processes,
+        asr_threads_per_process=args.threads_per_process,
+        warmup_duration=0.0 if args.backend == 'stub' else float(os.environ.get('ASR_WARMUP_SECONDS', '1.0')),
+    )
+    if _profile is not None:
+        _profile.report_when_ready(models)
+    server = TranscriptionServer(
+        models=models,
+        transcript_cache=TranscriptCache(max_entries=2048, path=None),
+        ingest_workers=args.ingest_workers,
+        partial_interval=args.partial_interval or None,
+        max_connections=args.max_connections,
+        speculative_silence=args.speculative_silence or None,
+        stream_translation=args.stream_translation,
+        transcript_filter=TranscriptFilter(blocklist=load_blocklist(args.blocklist)) if args.blocklist else None,
+    )
+    async with serve(server.handle, args.host, args.port, max_size=2**20) as ws_server:
+        print(f"[I] Listening on ws://{args.host}:{args.port}")
+        try:
+            await ws_server.serve_forever()
+        finally:
+            server.close()
+            models.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,47 +1,244 @@
 import os
+import time
 import shutil
+import threading
 import numpy as np
-import soundfile as sf
+from queue import Queue, Full, Empty
+from typing import Dict, List, Optional, Tuple
+
+from src.tools.metrics import metrics
+
+# One record per segment in <prefix>.idx, offsets and lengths are in samples of <prefix>.pcm.
+INDEX_DTYPE = np.dtype([('segment_id', '<i8'), ('offset', '<i8'), ('length', '<i8'), ('sample_rate', '<i8')])
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    # Quantize once ourselves so the samples on disk are exactly the ones
+    # the transcript cache hashed for the live utterance.
+    if audio.dtype == np.int16:
+        return audio
+    if np.issubdtype(audio.dtype, np.integer):
+        raise ValueError(f"Expected int16 or float PCM, got {audio.dtype}")
+    return np.clip(np.floor(audio * 32768.0), -32768, 32767).astype(np.int16)
+
+
+def cleanup_sessions(
+    root: str = './sessions',
+    max_age: Optional[float] = None,        # seconds since a session was last written
+    max_bytes: Optional[int] = None,        # total size of root, oldest sessions go first
+    keep: Tuple[str, ...] = (),
+) -> List[str]:
+    # Retention for the per-session directories, replaces wiping everything on start.
+    if not os.path.isdir(root):
+        return []
+    sessions = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not os.path.isdir(path) or name in keep:
+            continue
+        files = [os.path.join(path, f) for f in os.listdir(path)]
+        size = sum(os.path.getsize(f) for f in files if os.path.isfile(f))
+        mtime = max((os.path.getmtime(f) for f in files), default=os.path.getmtime(path))
+        sessions.append((mtime, size, path))
+
+    sessions.sort()
+    total = sum(size for _, size, _ in sessions)
+    now = time.time()
+    removed = []
+    for mtime, size, path in sessions:
+        expired = max_age is not None and now - mtime > max_age
+        oversized = max_bytes is not None and total > max_bytes
+        if not (expired or oversized):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed.append(path)
+    if removed:
+        print(f"[I] Removed {len(removed)} old session(s) from '{root}'")
+    return removed
+
+
+class SegmentStore:
+    """
+    Read side of an AudioWriter container: memory-maps <prefix>.pcm and
+    hands out int16 views of segments by id, no decode and no copy.
+    """
+
+    def __init__(self, output_dir: str, prefix: str = 'chunk'):
+        self.data_path = os.path.join(output_dir, f"{prefix}.pcm")
+        self.index_path = os.path.join(output_dir, f"{prefix}.idx")
+        self._index: Dict[int, Tuple[int, int, int]] = {}     # segment_id -> (offset, length, sample_rate)
+        self._index_bytes = 0
+        self._map: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def add(self, segment_id: int, offset: int, length: int, sample_rate: int):
+        with self._lock:
+            self._index[segment_id] = (offset, length, sample_rate)
+
+    def refresh(self):
+        # Picks up records appended by another writer since the last call; a
+        # record without its samples (crash mid-write) is skipped for now.
+        if not os.path.exists(self.index_path):
+            return
+        with self._lock:
+            size = os.path.getsize(self.index_path)
+            count = (size - self._index_bytes) // INDEX_DTYPE.itemsize
+            if count <= 0:
+                return
+            records = np.fromfile(self.index_path, dtype=INDEX_DTYPE, count=count, offset=self._index_bytes)
+            n_samples = os.path.getsize(self.data_path) // 2 if os.path.exists(self.data_path) else 0
+            for record in records:
+                if record['offset'] + record['length'] > n_samples:
+                    break
+                self._index[int(record['segment_id'])] = (int(record['offset']), int(record['length']), int(record['sample_rate']))
+                self._index_bytes += INDEX_DTYPE.itemsize
+
+    def get(self, segment_id: int) -> Optional[np.ndarray]:
+        entry = self._index.get(segment_id)
+        if entry is None:
+            self.refresh()
+            entry = self._index.get(segment_id)
+            if entry is None:
+                return None
+        offset, length, _ = entry
+        if length == 0:
+            return np.zeros(0, dtype=np.int16)
+        with self._lock:
+            # The container only grows, remap once a segment lies past the current mapping.
+            if self._map is None or offset + length > len(self._map):
+                self._map = np.memmap(self.data_path, dtype=np.int16, mode='r')
+            return self._map[offset:offset + length].view(np.ndarray)
+
+    def sample_rate(self, segment_id: int) -> Optional[int]:
+        entry = self._index.get(segment_id)
+        return entry[2] if entry else None
+
+    def segment_ids(self) -> List[int]:
+        with self._lock:
+            return sorted(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
 
 
 class AudioWriter:
+    """
+    Appends int16 segments to one <prefix>.pcm container per session and
+    their offsets to <prefix>.idx. Writes happen on a background thread in
+    batches; submit() never touches the disk and drops the segment if the
+    queue is full.
+    """
+
     def __init__(
         self,
         output_dir: str = './sessions',
         sample_rate: int = 16000,
-        prefix: str = 'chunk'
+        prefix: str = 'chunk',
+        max_queue: int = 64,
+        max_batch: int = 16,             # segments appended per write
+        labels: Optional[Dict[str, str]] = None,
     ):
         self.output_dir = output_dir
         self.sample_rate = sample_rate
         self.prefix = prefix
-        self._chunk_id = 0
-        
-        if os.path.exists(self.output_dir):
-            shutil.rmtree(self.output_dir)
+        self.max_batch = max_batch
+        self.dropped = 0
+        self.labels = dict(labels or {}, stage='writer')
+        self.data_path = os.path.join(output_dir, f"{prefix}.pcm")
+        self.index_path = os.path.join(output_dir, f"{prefix}.idx")
         os.makedirs(self.output_dir, exist_ok=True)
-    
-    def write_chunk(self, audio_chunk: np.ndarray) -> str:
-        filepath = self._get_filepath()
-        
-        with sf.SoundFile(
-            filepath,
-            mode='w',
-            samplerate=self.sample_rate,
-            channels=1,
-            format='WAV'
-        ) as w:
-            w.write(audio_chunk)
-        
-        self._chunk_id += 1
-        return filepath
-    
-    def _get_filepath(self) -> str:
-        filename = f"{self.prefix}-{self._chunk_id}.wav"
-        return os.path.join(self.output_dir, filename)
-    
-    def get_chunk_count(self) -> int:
-        return self._chunk_id
-    
-    def reset_counter(self):
-        self._chunk_id = 0
-        print("[W] AudioWriter counter reset")
\ No newline at end of file
+
+        self.store = SegmentStore(output_dir, prefix)
+        self._pending: Dict[int, np.ndarray] = {}              # queued but not yet on disk
+        self._lock = threading.Lock()
+        self._queue = Queue(maxsize=max_queue)
+
+        self._data_file = open(self.data_path, 'ab')
+        self._index_file = open(self.index_path, 'ab')
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"writer-{os.path.basename(output_dir)}", daemon=True)
+        self._thread.start()
+
+    def submit(self, segment_id: int, audio: np.ndarray) -> bool:
+        pcm = to_pcm16(audio)
+        with self._lock:
+            self._pending[segment_id] = pcm
+        try:
+            self._queue.put_nowait((segment_id, pcm, time.perf_counter()))
+            metrics.gauge('queue_depth', self._queue.qsize(), **self.labels)
+            return True
+        except Full:
+            with self._lock:
+                self._pending.pop(segment_id, None)
+            self.dropped += 1
+            metrics.inc('dropped_total', **self.labels)
+            print(f"[W] AudioWriter '{self.output_dir}' is full, dropping segment {segment_id}")
+            return False
+
+    def reference(self, segment_id: int) -> str:
+        return f"{self.data_path}#{segment_id}"
+
+    def read_segment(self, segment_id: int) -> Optional[np.ndarray]:
+        with self._lock:
+            pending = self._pending.get(segment_id)
+        if pending is not None:
+            return pending
+        return self.store.get(segment_id)
+
+    def segment_ids(self) -> List[int]:
+        with self._lock:
+            pending = set(self._pending)
+        return sorted(pending.union(self.store.segment_ids()))
+
+    def flush(self):
+        # Blocks until every submitted segment is on disk.
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._stop_event.set()
+        self._thread.join()
+        self._data_file.close()
+        self._index_file.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except Empty:
+                continue
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                self._write_batch(batch)
+                metrics.observe('stage_seconds', time.perf_counter() - started, **self.labels)
+            except Exception as e:
+                print(f"[E] AudioWriter failed to write {len(batch)} segment(s): {e}")
+            finally:
+                for segment_id, _, enqueued in batch:
+                    metrics.observe('queue_wait_seconds', started - enqueued, **self.labels)
+                    with self._lock:
+                        self._pending.pop(segment_id, None)
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[Tuple[int, np.ndarray, float]]):
+        offset = self._data_file.tell() // 2
+        records = np.empty(len(batch), dtype=INDEX_DTYPE)
+        for i, (segment_id, pcm, _) in enumerate(batch):
+            records[i] = (segment_id, offset, len(pcm), self.sample_rate)
+            offset += len(pcm)
+
+        # Samples first, so an index record never points past the data.
+        self._data_file.write(b''.join(pcm.tobytes() for _, pcm, _ in batch))
+        self._data_file.flush()
+        self._index_file.write(records.tobytes())
+        self._index_file.flush()
+        for record in records:
+            self.store.add(int(record['segment_id']), int(record['offset']), int(record['length']), self.sample_rate)
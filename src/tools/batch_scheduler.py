@@ -0,0 +1,85 @@
+import time
+import threading
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class BatchScheduler:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,     # seconds the first request waits for company
+        name: str = 'batch',
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"BatchScheduler '{name}' needs max_batch_size >= 1, got {max_batch_size}")
+
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue: "Queue[Tuple[Any, Future]]" = Queue()
+        self._stop_event = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name=f"{self.name}-scheduler", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+            self._worker = None
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                print(f"[E] Batch scheduler '{self.name}' failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
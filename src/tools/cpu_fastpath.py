@@ -0,0 +1,27 @@
+import torch
+from typing import Optional
+
+
+def configure_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    # Process-wide in torch, so worker processes each set their own share of the cores.
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            # Only allowed before the first parallel op of the process.
+            print(f"[W] Could not set inter-op threads to {inter_op}: {e}")
+    print(f"[I] torch threads: intra_op={torch.get_num_threads()}, inter_op={torch.get_num_interop_threads()}")
+
+
+def quantize_linear(model: torch.nn.Module, device: str) -> torch.nn.Module:
+    # Dynamic int8 for nn.Linear: weights quantized once, activations per call.
+    # CPU-only kernels, a CUDA model is returned unchanged.
+    if device != 'cpu':
+        print(f"[W] int8 dynamic quantization is CPU-only, keeping {type(model).__name__} in full precision on {device}")
+        return model
+    n_linear = sum(isinstance(m, torch.nn.Linear) for m in model.modules())
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    print(f"[I] Quantized {n_linear} Linear layers of {type(model).__name__} to int8")
+    return model
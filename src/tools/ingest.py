@@ -0,0 +1,64 @@
+import numpy as np
+from typing import Optional
+
+from src.tools.soxr_stream_resampler import SOXRStreamAudioResampler
+
+# Full-scale value of each integer PCM format, other dtypes are taken as is.
+_SCALES = {
+    np.dtype(np.int16): 1.0 / 32768.0,
+    np.dtype(np.int32): 1.0 / 2147483648.0,
+}
+
+
+class AudioIngest:
+    """Turns gradio microphone chunks into mono float32 PCM at sample_rate."""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        resampler: Optional[SOXRStreamAudioResampler] = None,
+        initial_capacity: int = 48_000,     # samples, grows to the largest chunk seen
+    ):
+        self.sample_rate = sample_rate
+        self._resampler = resampler or SOXRStreamAudioResampler(dtype='float32')
+        self._buffer = np.empty(initial_capacity, dtype=np.float32)
+        self._scratch = np.empty(initial_capacity, dtype=np.float32)     # one channel while downmixing
+
+    def process(self, audio_sr: int, audio_chunk: np.ndarray) -> np.ndarray:
+        # Resample to 16kHz, the per-session stream carries filter state across chunks
+        return self._resampler.resample(self.convert(audio_chunk), in_rate=audio_sr, out_rate=self.sample_rate)
+
+    def convert(self, audio_chunk: np.ndarray) -> np.ndarray:
+        # Scale, downmix and clip into reused buffers. Only casting
+        # assignments and in-place float32 ops are used, ufuncs that cast
+        # would allocate a temporary per call. The returned view is only
+        # valid until the next call.
+        n_samples = audio_chunk.shape[0]
+        if n_samples > len(self._buffer):
+            self._buffer = np.empty(n_samples, dtype=np.float32)
+            self._scratch = np.empty(n_samples, dtype=np.float32)
+        out = self._buffer[:n_samples]
+
+        scale = _SCALES.get(audio_chunk.dtype, 1.0)
+        if audio_chunk.ndim > 1:
+            channels = audio_chunk.shape[1]
+            out[...] = audio_chunk[:, 0]
+            for channel in range(1, channels):
+                if audio_chunk.dtype == np.float32:
+                    out += audio_chunk[:, channel]
+                else:
+                    scratch = self._scratch[:n_samples]
+                    scratch[...] = audio_chunk[:, channel]
+                    out += scratch
+            scale /= channels
+        else:
+            out[...] = audio_chunk
+        if scale != 1.0:
+            out *= np.float32(scale)
+
+        # Clip to [-1, 1] range (safety measure)
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+    def reset(self):
+        self._resampler.reset()
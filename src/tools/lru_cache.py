@@ -0,0 +1,97 @@
+import os
+import json
+import atexit
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        path: Optional[str] = None,     # JSON file to persist entries to, None keeps the cache in memory
+        save_every: int = 64,           # number of puts between automatic saves when path is set
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        if self.path and os.path.exists(self.path):
+            self.load()
+        if self.path:
+            # Puts since the last automatic save would otherwise be lost on a plain exit.
+            atexit.register(self.close)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path is not None and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            items = [[list(key) if isinstance(key, tuple) else key, value] for key, value in self._entries.items()]
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        # Saves what the automatic saves haven't yet.
+        if self.path and self._unsaved:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[W] Failed to load cache '{self.path}': {e}")
+            return
+        with self._lock:
+            for key, value in items[-self.max_entries:]:
+                self._entries[tuple(key) if isinstance(key, list) else key] = value
+        print(f"[I] Loaded {len(self._entries)} cached entries from '{self.path}'")
@@ -0,0 +1,182 @@
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+class MetricsSink(ABC):
+    """Receives every metric event; kind is 'counter', 'gauge' or 'summary'."""
+
+    @abstractmethod
+    def emit(self, event: dict):
+        ...
+
+    def close(self):
+        pass
+
+
+class Metrics:
+    def __init__(self):
+        self._sinks: List[MetricsSink] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._sinks)
+
+    def add_sink(self, sink: MetricsSink) -> MetricsSink:
+        with self._lock:
+            self._sinks = self._sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink: MetricsSink):
+        with self._lock:
+            self._sinks = [s for s in self._sinks if s is not sink]
+        sink.close()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        self._emit('counter', name, value, labels)
+
+    def gauge(self, name: str, value: float, **labels):
+        self._emit('gauge', name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        self._emit('summary', name, value, labels)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _emit(self, kind: str, name: str, value: float, labels: dict):
+        sinks = self._sinks
+        if not sinks:
+            return
+        event = {'ts': time.time(), 'kind': kind, 'name': name, 'value': float(value), 'labels': labels}
+        for sink in sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                print(f"[E] Metrics sink {type(sink).__name__} failed: {e}")
+
+
+class JsonlSink(MetricsSink):
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusSink(MetricsSink):
+    """Aggregates events in memory and renders the Prometheus text format."""
+
+    def __init__(self, namespace: str = 'stream', window: int = 1024, quantiles: Tuple[float, ...] = (0.5, 0.9, 0.99)):
+        self.namespace = namespace
+        self.window = window
+        self.quantiles = quantiles
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._gauges: Dict[Tuple[str, tuple], float] = {}
+        self._summaries: Dict[Tuple[str, tuple], Tuple[int, float, Deque[float]]] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def emit(self, event: dict):
+        key = (event['name'], tuple(sorted(event['labels'].items())))
+        value = event['value']
+        with self._lock:
+            if event['kind'] == 'counter':
+                self._counters[key] = self._counters.get(key, 0.0) + value
+            elif event['kind'] == 'gauge':
+                self._gauges[key] = value
+            else:
+                count, total, recent = self._summaries.get(key) or (0, 0.0, deque(maxlen=self.window))
+                recent.append(value)
+                self._summaries[key] = (count + 1, total + value, recent)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, values in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted({name for name, _ in values}):
+                    metric = f"{self.namespace}_{name}"
+                    lines.append(f"# TYPE {metric} {kind}")
+                    for (n, labels), value in values.items():
+                        if n == name:
+                            lines.append(f"{metric}{self._labels(labels)} {value:g}")
+
+            for name in sorted({name for name, _ in self._summaries}):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} summary")
+                for (n, labels), (count, total, recent) in self._summaries.items():
+                    if n != name:
+                        continue
+                    for q, value in zip(self.quantiles, np.quantile(np.fromiter(recent, dtype=np.float64), self.quantiles)):
+                        lines.append(f"{metric}{self._labels(labels + (('quantile', q),))} {value:.6f}")
+                    lines.append(f"{metric}_sum{self._labels(labels)} {total:.6f}")
+                    lines.append(f"{metric}_count{self._labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, host: str = '0.0.0.0', port: int = 9464):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = sink.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"[I] Prometheus metrics on http://{host}:{port}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        if not labels:
+            return ''
+        escaped = (
+            f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for k, v in labels
+        )
+        return '{' + ','.join(escaped) + '}'
+
+
+# Process-wide registry the pipeline reports to; a no-op until a sink is added.
+metrics = Metrics()
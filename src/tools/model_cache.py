@@ -0,0 +1,57 @@
+import os
+import re
+import shutil
+import tempfile
+from typing import Callable, Optional
+
+
+def cache_dir() -> str:
+    # MODEL_CACHE_DIR, else ~/.cache/live-transcription, which only holds the local model copies.
+    return os.path.abspath(os.path.expanduser(
+        os.environ.get('MODEL_CACHE_DIR') or os.path.join('~', '.cache', 'live-transcription')
+    ))
+
+
+def configure(path: Optional[str] = None) -> str:
+    # With an explicit cache directory (path or MODEL_CACHE_DIR) the hub
+    # caches of transformers, NeMo and torch move into it; they read these
+    # when first imported, so call this before them. Otherwise the libraries
+    # keep their own defaults under ~/.cache, which are persistent already
+    # and may hold the weights of earlier deploys. Variables already set in
+    # the environment win either way, worker processes inherit them.
+    if path is not None:
+        os.environ['MODEL_CACHE_DIR'] = path
+    root = cache_dir()
+    if os.environ.get('MODEL_CACHE_DIR'):
+        os.environ.setdefault('HF_HOME', os.path.join(root, 'huggingface'))
+        os.environ.setdefault('NEMO_CACHE_DIR', os.path.join(root, 'nemo'))
+        os.environ.setdefault('TORCH_HOME', os.path.join(root, 'torch'))
+    return root
+
+
+def local_path(model_name: str, suffix: str = '') -> str:
+    # Where a loaded model is saved for the next start, e.g. local/nvidia--parakeet-tdt-0.6b-v3.nemo
+    name = re.sub(r'[^\w.-]+', '--', model_name.strip('/'))
+    return os.path.join(cache_dir(), 'local', name + suffix)
+
+
+def save_local(path: str, save: Callable[[str], None]):
+    # save(tmp) writes the copy next to path, which is then renamed into
+    # place, so a concurrent reader never sees half a model. When several
+    # processes save the same model the first rename wins.
+    if os.path.exists(path):
+        return
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.saving-')
+    try:
+        target = os.path.join(tmp, os.path.basename(path))
+        save(target)
+        os.rename(target, path)
+        print(f"[I] Saved local model copy to '{path}'")
+    except Exception as e:
+        # Only a missed shortcut for the next start, the loaded model is fine.
+        if not os.path.exists(path):
+            print(f"[W] Could not save local model copy to '{path}': {e}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,277 @@
+import time
+import threading
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional
+
+from src.tools.batch_scheduler import BatchScheduler
+from src.tools.metrics import metrics
+from src.transcribe import registry
+
+
+class ModelPool:
+    """ASR and translation models shared by every StreamProcessor session."""
+
+    def __init__(
+        self,
+        asr_backend: str = 'canary',            # one of registry.available_backends()
+        asr_model: Optional[str] = None,        # None picks the backend's default model
+        asr_options: Optional[Dict[str, Any]] = None,   # extra backend constructor arguments
+        translator_factory: Optional[Callable[..., Any]] = None,    # defaults to the T5 Translator
+        background: bool = True,                # load weights on a thread so the server can bind meanwhile
+        warmup_duration: float = 1.0,           # seconds of silence decoded once after loading, 0 disables
+        asr_max_batch_size: int = 8,
+        asr_max_wait: float = 0.05,     # seconds an utterance waits for others to batch with
+        translate_max_batch_size: int = 16,
+        translate_max_wait: float = 0.02,
+        translation_cache_path: Optional[str] = None,
+        translator_options: Optional[Dict[str, Any]] = None,   # extra Translator arguments, e.g. quantize
+        intra_op_threads: Optional[int] = None,     # torch thread pools, None keeps torch's defaults
+        inter_op_threads: Optional[int] = None,
+        asr_processes: int = 0,                 # >0 runs ASR in that many worker processes instead of in-process
+        asr_threads_per_process: Optional[int] = None,
+        parallel_load: bool = True,             # load the translator while the ASR model loads
+    ):
+        self.asr_backend = asr_backend
+        self.asr_options = dict(asr_options or {})
+        self.warmup_duration = warmup_duration
+        self.timings: Dict[str, float] = {}
+        self._asr = None
+        self._translator = None
+        self._translator_factory = translator_factory
+        self._translate_max_batch_size = translate_max_batch_size
+        self._translation_cache_path = translation_cache_path
+        self._translator_options = dict(translator_options or {})
+        self._threads = (intra_op_threads, inter_op_threads)
+        self._asr_processes = asr_processes
+        self._asr_threads_per_process = asr_threads_per_process
+        self._parallel_load = parallel_load
+        self._asr_max_batch_size = asr_max_batch_size
+        self._asr_max_wait = asr_max_wait
+        self._ready = threading.Event()
+        self._asr_lock = threading.Lock()  # held while decoding and while swapping models
+        self._translate_lock = threading.Lock()    # batched and streamed generate() share one model
+
+        # Utterances from every session are coalesced into one padded ASR call.
+        self._asr_scheduler = BatchScheduler(
+            batch_fn=self._transcribe_batch,
+            max_batch_size=asr_max_batch_size,
+            max_wait=asr_max_wait,
+            name='asr',
+        )
+        self._translate_scheduler = BatchScheduler(
+            batch_fn=self._translate_batch,
+            max_batch_size=translate_max_batch_size,
+            max_wait=translate_max_wait,
+            name='translate',
+        )
+        self._asr_scheduler.start()
+        self._translate_scheduler.start()
+
+        if background:
+            threading.Thread(
+                target=self._load,
+                args=(asr_backend, asr_model),
+                name='model-loader',
+                daemon=True,
+            ).start()
+        else:
+            self._load(asr_backend, asr_model)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def load_model(self, model_name: Optional[str] = None, backend: Optional[str] = None):
+        # Swaps the ASR model at runtime; queued utterances wait for the new one.
+        backend = backend or self.asr_backend
+        model_name = model_name or registry.default_model(backend)
+        if self._asr_processes > 0:
+            self._load_workers(backend, model_name)
+            return
+        with self._asr_lock:
+            start = time.perf_counter()
+            if self._asr is not None and isinstance(self._asr, registry.backend_class(backend)):
+                self._asr.load_model(model_name=model_name)
+            else:
+                self._unload_asr()
+                self._asr = registry.create_backend(backend, model_name=model_name, **self.asr_options)
+            self.asr_backend = backend
+            self.timings['asr_load'] = time.perf_counter() - start
+            self._warmup_asr()
+
+    def unload_model(self):
+        with self._asr_lock:
+            self._unload_asr()
+
+    def close(self):
+        # Unloads ASR and writes out the translation cache, at shutdown.
+        self.unload_model()
+        translator = self._translator
+        if translator is not None and hasattr(translator, 'close'):
+            translator.close()
+
+    def transcribe(self, speech_array: np.ndarray) -> str:
+        if self._asr_processes > 0:
+            # Each worker process batches on its own, the in-process scheduler is bypassed.
+            self._ready.wait()
+            # Submitted under the lock: a swap in _load_workers closes the old
+            # pool only after this, and close() still finishes queued jobs.
+            with self._asr_lock:
+                workers = self._asr
+                if workers is None:
+                    print("[W] Model not loaded. Cannot transcribe.")
+                    return ""
+                future = workers.submit(speech_array)
+            return future.result()
+        return self._asr_scheduler.submit(speech_array).result()
+
+    def translate(self, text: str) -> str:
+        return self._translate_scheduler.submit(text).result()
+
+    def translate_stream(self, text: str, on_text: Callable[[str], None]) -> str:
+        # Unbatched, on_text sees the translation grow word by word. Falls back
+        # to the batched path for translators without streaming.
+        self._ready.wait()
+        translator = self._translator
+        if translator is None or not hasattr(translator, 'translate_stream'):
+            return self.translate(text)
+        with self._translate_lock, metrics.span('model_seconds', model='translate', mode='stream'):
+            return translator.translate_stream(text, on_text)
+
+    def signature(self) -> str:
+        # Identifies everything that shapes a transcript, part of the transcript cache key.
+        asr_model = _variant(self._asr)
+        translator_model = _variant(self._translator)
+        target = self._translator.target if self._translator is not None else None
+        return f"{self.asr_backend}:{asr_model}|{translator_model}:{target}"
+
+    def translation_cache_stats(self) -> Dict[str, float]:
+        if self._translator is None:
+            return {}
+        return self._translator.cache.stats()
+
+    def _load(self, asr_backend: str, asr_model: Optional[str]):
+        # Reading and deserializing weights mostly releases the GIL, so the
+        # two models load side by side; each ends up in timings on its own.
+        translator_loader = threading.Thread(target=self._load_translator, name='translator-loader', daemon=True)
+        try:
+            start = time.perf_counter()
+            if any(self._threads):
+                from src.tools.cpu_fastpath import configure_threads
+                configure_threads(*self._threads)
+            if self._parallel_load:
+                translator_loader.start()
+            self.load_model(model_name=asr_model, backend=asr_backend)
+            if self._parallel_load:
+                translator_loader.join()
+            else:
+                self._load_translator()
+            self.timings['total'] = time.perf_counter() - start
+            print("[I] Models ready: " + ", ".join(f"{name}={secs:.2f}s" for name, secs in self.timings.items()))
+        except Exception as e:
+            print(f"[E] Failed to load models: {e}")
+        finally:
+            if translator_loader.is_alive():
+                translator_loader.join()
+            self._ready.set()
+
+    def _load_translator(self):
+        try:
+            start = time.perf_counter()
+            translator_factory = self._translator_factory
+            if translator_factory is None:
+                from src.tools.translator import Translator
+                translator_factory = Translator
+            self._translator = translator_factory(
+                source='en',
+                target='ru',
+                max_batch_size=self._translate_max_batch_size,
+                cache_path=self._translation_cache_path,
+                **self._translator_options,
+            )
+            self.timings['translator_load'] = time.perf_counter() - start
+            self._warmup_translator()
+        except Exception as e:
+            print(f"[E] Failed to load translator: {e}")
+
+    def _load_workers(self, backend: str, model_name: str):
+        from src.tools.worker_pool import InferencePool
+        start = time.perf_counter()
+        workers = InferencePool(
+            n_workers=self._asr_processes,
+            backend=backend,
+            model_name=model_name,
+            options=self.asr_options,
+            threads_per_worker=self._asr_threads_per_process,
+            warmup_duration=self.warmup_duration,
+            max_batch_size=self._asr_max_batch_size,
+            max_wait=self._asr_max_wait,
+        )
+        if not workers.wait_until_ready(workers.load_timeout):
+            workers.close()
+            raise RuntimeError(f"No ASR worker process came up for '{model_name}'")
+        # New requests go to the new workers while the old ones finish their queue.
+        with self._asr_lock:
+            previous, self._asr = self._asr, workers
+            self.asr_backend = backend
+        if previous is not None:
+            previous.close()
+        self.timings['asr_load'] = time.perf_counter() - start
+
+    def _warmup_asr(self):
+        # First decode pays for lazy allocations and kernel selection, do it before users do.
+        if self.warmup_duration <= 0 or self._asr is None:
+            return
+        start = time.perf_counter()
+        self._asr.transcribe_batch([np.zeros(int(16_000 * self.warmup_duration), dtype=np.float32)])
+        self.timings['asr_warmup'] = time.perf_counter() - start
+
+    def _warmup_translator(self):
+        if self.warmup_duration <= 0:
+            return
+        start = time.perf_counter()
+        self._translator.warmup()
+        self.timings['translator_warmup'] = time.perf_counter() - start
+
+    def _unload_asr(self):
+        if self._asr is not None:
+            self._asr.unload_model()
+            self._asr = None
+
+    def _transcribe_batch(self, speech_arrays: List[np.ndarray]) -> List[str]:
+        self._ready.wait()
+        with self._asr_lock:
+            if self._asr is None:
+                print("[W] Model not loaded. Cannot transcribe.")
+                return [""] * len(speech_arrays)
+            start = time.perf_counter()
+            texts = self._asr.transcribe_batch(speech_arrays=speech_arrays)
+            elapsed = time.perf_counter() - start
+
+        audio_seconds = sum(len(speech_array) for speech_array in speech_arrays) / 16_000
+        metrics.observe('model_seconds', elapsed, model='asr', backend=self.asr_backend)
+        metrics.observe('batch_size', len(speech_arrays), model='asr')
+        if audio_seconds > 0:
+            metrics.observe('asr_rtf', elapsed / audio_seconds, backend=self.asr_backend)
+        metrics.inc('asr_audio_seconds_total', audio_seconds, backend=self.asr_backend)
+        return texts
+
+    def _translate_batch(self, texts: List[str]) -> List[str]:
+        self._ready.wait()
+        if self._translator is None:
+            print("[W] Translator not loaded. Cannot translate.")
+            return [""] * len(texts)
+        with self._translate_lock, metrics.span('model_seconds', model='translate'):
+            translations = self._translator.translate_batch(texts)
+        metrics.observe('batch_size', len(texts), model='translate')
+        return translations
+
+
+def _variant(model) -> Optional[str]:
+    # Quantized weights transcribe differently, so they get their own cache entries.
+    if model is None:
+        return None
+    return model.model_name + (':int8' if getattr(model, 'quantize', False) else '')
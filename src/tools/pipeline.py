@@ -0,0 +1,128 @@
+import time
+import threading
+from queue import Queue, Full, Empty
+from typing import Any, Callable, Dict, List, Optional
+
+from src.tools.metrics import metrics
+
+
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+
+class PipelineStage:
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        concurrency: int = 1,
+        max_queue: int = 8,
+        overflow: str = 'block',            # what submit() does when the queue is full
+        on_result: Optional[Callable[[Any], None]] = None,
+        on_drop: Optional[Callable[[Any], None]] = None,   # gets each item the overflow policy discards
+        labels: Optional[Dict[str, str]] = None,   # extra metric labels, keep them low-cardinality (no session ids)
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        if concurrency < 1:
+            raise ValueError(f"PipelineStage '{name}' needs at least one worker, got {concurrency}")
+
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.overflow = overflow
+        self.on_result = on_result
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.labels = dict(labels or {}, stage=name)
+        self._queue = Queue(maxsize=max_queue)
+        self._workers: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self._workers:
+            return
+        self._stop_event.clear()
+        for i in range(self.concurrency):
+            worker = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
+
+    def submit(self, item: Any) -> bool:
+        entry = (item, time.perf_counter())
+        if self.overflow == 'block':
+            self._queue.put(entry)
+            self._report_depth()
+            return True
+
+        try:
+            self._queue.put_nowait(entry)
+            self._report_depth()
+            return True
+        except Full:
+            pass
+
+        self.dropped += 1
+        metrics.inc('dropped_total', **self.labels)
+        if self.overflow == 'drop_newest':
+            print(f"[W] Pipeline stage '{self.name}' is full, dropping new item")
+            self._dropped(item)
+            return False
+
+        # drop_oldest: make room by discarding the item that waited longest
+        try:
+            oldest, _ = self._queue.get_nowait()
+            self._queue.task_done()
+        except Empty:
+            oldest = None
+        print(f"[W] Pipeline stage '{self.name}' is full, dropping oldest item")
+        if oldest is not None:
+            self._dropped(oldest)
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except Full:
+            self._dropped(item)
+            return False
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def join(self):
+        self._queue.join()
+
+    def _dropped(self, item: Any):
+        if self.on_drop is None:
+            return
+        try:
+            self.on_drop(item)
+        except Exception as e:
+            print(f"[E] Pipeline stage '{self.name}' on_drop failed: {e}")
+
+    def _report_depth(self):
+        metrics.gauge('queue_depth', self._queue.qsize(), **self.labels)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                item, enqueued = self._queue.get(timeout=0.1)
+            except Empty:
+                continue
+
+            started = time.perf_counter()
+            metrics.observe('queue_wait_seconds', started - enqueued, **self.labels)
+            self._report_depth()
+            try:
+                result = self.handler(item)
+                metrics.observe('stage_seconds', time.perf_counter() - started, **self.labels)
+                if self.on_result is not None and result is not None:
+                    self.on_result(result)
+            except Exception as e:
+                print(f"[E] Pipeline stage '{self.name}' failed: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,87 @@
+import numpy as np
+from typing import Optional
+
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'error')
+
+
+class RingBuffer:
+    """
+    Fixed-capacity sample buffer allocated once. Every sample is written
+    twice, at i and i + capacity, so the buffered samples are always one
+    contiguous slice of the backing array and view() never copies.
+
+    Views stay valid until an append wraps over them; copy anything that
+    outlives the next append or leaves the owning thread.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32, overflow: str = 'drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        if capacity < 1:
+            raise ValueError(f"RingBuffer capacity must be positive, got {capacity}")
+        self.capacity = int(capacity)
+        self.overflow = overflow
+        self.dropped = 0    # samples lost to the overflow policy
+        self._buffer = np.zeros(2 * self.capacity, dtype=dtype)
+        self._head = 0
+        self._length = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, samples: np.ndarray) -> int:
+        # Returns how many of the samples were kept.
+        n = len(samples)
+        free = self.capacity - self._length
+        if n > free:
+            if self.overflow == 'error':
+                raise OverflowError(f"RingBuffer of {self.capacity} samples has room for {free}, got {n}")
+            if self.overflow == 'drop_newest':
+                self.dropped += n - free
+                samples = samples[:free]
+                n = free
+            else:
+                if n > self.capacity:
+                    self.dropped += n - self.capacity
+                    samples = samples[-self.capacity:]
+                    n = self.capacity
+                overflow = self._length + n - self.capacity
+                if overflow > 0:
+                    self.dropped += overflow
+                    self.drop_front(overflow)
+        if n == 0:
+            return 0
+
+        capacity = self.capacity
+        position = (self._head + self._length) % capacity
+        first = min(n, capacity - position)
+        self._buffer[position:position + first] = samples[:first]
+        self._buffer[position + capacity:position + capacity + first] = samples[:first]
+        rest = n - first
+        if rest:
+            self._buffer[:rest] = samples[first:]
+            self._buffer[capacity:capacity + rest] = samples[first:]
+        self._length += n
+        return n
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        # Samples [start, stop) counted from the oldest one, as a slice of the backing array.
+        if stop is None:
+            stop = self._length
+        start = max(0, min(start, self._length))
+        stop = max(start, min(stop, self._length))
+        return self._buffer[self._head + start:self._head + stop]
+
+    def drop_front(self, n: int):
+        n = max(0, min(n, self._length))
+        self._head = (self._head + n) % self.capacity
+        self._length -= n
+
+    def clear(self):
+        self._head = 0
+        self._length = 0
@@ -0,0 +1,57 @@
+import time
+import threading
+from typing import Callable, Dict, Tuple
+
+from src.tools.stream_porcessor import StreamProcessor
+
+
+class SessionManager:
+    def __init__(
+        self,
+        factory: Callable[[str], StreamProcessor],
+        idle_timeout: float = 600.0,    # seconds without audio before a session is reaped
+        reap_interval: float = 30.0,
+    ):
+        self._factory = factory
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._sessions: Dict[str, Tuple[StreamProcessor, float]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reaper = threading.Thread(target=self._reap_loop, name='session-reaper', daemon=True)
+        self._reaper.start()
+
+    def get(self, session_id: str) -> StreamProcessor:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            processor = entry[0] if entry else None
+            if processor is None:
+                processor = self._factory(session_id)
+                print(f"[I] Session '{session_id}' created ({len(self._sessions) + 1} active)")
+            self._sessions[session_id] = (processor, time.monotonic())
+        return processor
+
+    def remove(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            entry[0].close()
+            print(f"[I] Session '{session_id}' closed ({len(self._sessions)} active)")
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def close(self):
+        self._stop_event.set()
+        for session_id in list(self._sessions):
+            self.remove(session_id)
+
+    def _reap_loop(self):
+        while not self._stop_event.wait(self.reap_interval):
+            deadline = time.monotonic() - self.idle_timeout
+            with self._lock:
+                expired = [sid for sid, (_, last_seen) in self._sessions.items() if last_seen < deadline]
+                processors = [self._sessions.pop(sid)[0] for sid in expired]
+            for session_id, processor in zip(expired, processors):
+                processor.close()
+                print(f"[I] Session '{session_id}' idle for {self.idle_timeout:.0f}s, reaped")
@@ -1,56 +1,69 @@
 import time
 import numpy as np
 import soxr
+from typing import Dict, Optional, Tuple
 
 CLEAR_STREAM_AFTER_SECS = 0.2
 
 class SOXRStreamAudioResampler:
-    def __init__(self):
-        self._in_rate: float | None = None
-        self._out_rate: float | None = None
+    def __init__(
+        self,
+        dtype: str = "float32",
+        quality: str = "VHQ",                           # Very High Quality
+        clear_after_secs: Optional[float] = None,       # wipe filter state after this much wall-clock idle, None keeps it
+    ):
+        self.dtype = dtype
+        self.quality = quality
+        self.clear_after_secs = clear_after_secs
         self._last_resample_time: float = 0
+        # One stream per rate pair, so a client switching devices doesn't rebuild the kernel each time.
+        self._soxr_streams: Dict[Tuple[float, float], soxr.ResampleStream] = {}
         self._soxr_stream: soxr.ResampleStream | None = None
+        self._rates: Tuple[float, float] | None = None
 
-    def _initialize(self, in_rate: float, out_rate: float):
-        self._in_rate = in_rate
-        self._out_rate = out_rate
-        self._last_resample_time = time.time()
-        self._soxr_stream = soxr.ResampleStream(
-            in_rate=in_rate, 
-            out_rate=out_rate, 
+    def _initialize(self, in_rate: float, out_rate: float) -> soxr.ResampleStream:
+        return soxr.ResampleStream(
+            in_rate=in_rate,
+            out_rate=out_rate,
             num_channels=1,
-            quality="VHQ",  # Very High Quality
-            dtype="int16"
+            quality=self.quality,
+            dtype=self.dtype
         )
 
     def _maybe_clear_internal_state(self):
         current_time = time.time()
-        time_since_last_resample = current_time - self._last_resample_time
-        if time_since_last_resample > CLEAR_STREAM_AFTER_SECS:
-            if self._soxr_stream:
+        if self.clear_after_secs is not None and self._soxr_stream is not None:
+            time_since_last_resample = current_time - self._last_resample_time
+            if time_since_last_resample > self.clear_after_secs:
                 self._soxr_stream.clear()
         self._last_resample_time = current_time
 
-    def _maybe_initialize_sox_stream(self, in_rate: int, out_rate: int):
-        if self._soxr_stream is None:
-            self._initialize(in_rate, out_rate)
+    def _select_stream(self, in_rate: int, out_rate: int):
+        rates = (in_rate, out_rate)
+        if rates != self._rates:
+            if self._soxr_stream is not None:
+                self._soxr_stream.clear()  # don't let the old rate's tail leak into a later switch back
+            stream = self._soxr_streams.get(rates)
+            if stream is None:
+                stream = self._soxr_streams[rates] = self._initialize(in_rate, out_rate)
+            self._soxr_stream = stream
+            self._rates = rates
+            self._last_resample_time = time.time()
         else:
             self._maybe_clear_internal_state()
 
-        if self._in_rate != in_rate or self._out_rate != out_rate:
-            raise ValueError(
-                f"SOXRStreamAudioResampler cannot be reused with different sample rates: "
-                f"expected {self._in_rate}->{self._out_rate}, got {in_rate}->{out_rate}"
-            )
-
     def resample(self, audio: np.ndarray, in_rate: int, out_rate: int, is_last: bool = False) -> np.ndarray:
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1, dtype=self.dtype)  # mono downmix
+        audio = np.ascontiguousarray(audio, dtype=self.dtype)
+
         if in_rate == out_rate:
             return audio
 
-        self._maybe_initialize_sox_stream(in_rate, out_rate)
+        self._select_stream(in_rate, out_rate)
         return self._soxr_stream.resample_chunk(audio, last=is_last)
-    
+
     def reset(self):
-        if self._soxr_stream:
-            self._soxr_stream.clear()
+        for stream in self._soxr_streams.values():
+            stream.clear()
         self._last_resample_time = time.time()
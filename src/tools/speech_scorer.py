@@ -0,0 +1,51 @@
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Optional
+
+
+class SpeechScorer(ABC):
+    """Speech probability for a batch of frames; frames is (n_frames, frame_samples) float32."""
+
+    @abstractmethod
+    def score(self, frames: np.ndarray) -> np.ndarray:
+        ...
+
+
+class MarbleNetScorer(SpeechScorer):
+    # Frame-level MarbleNet from NeMo, ~90k parameters, fast enough on CPU.
+    # One instance can be shared by every session, calls are serialized.
+    def __init__(
+        self,
+        model_name: str = "nvidia/frame_vad_multilingual_marblenet_v2.0",
+        sample_rate: int = 16_000,
+        device: Optional[str] = None,
+    ):
+        import torch
+        from nemo.collections.asr.models import EncDecFrameClassificationModel
+
+        self.model_name = model_name
+        self.sample_rate = sample_rate
+        self._torch = torch
+        self._device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self._lock = threading.Lock()
+        print(f"[I] Loading VAD model '{model_name}'...")
+        self._model = EncDecFrameClassificationModel.from_pretrained(model_name).to(self._device)
+        self._model.eval()
+        print(f"[I] VAD model loaded successfully on {self._device}")
+
+    def score(self, frames: np.ndarray) -> np.ndarray:
+        torch = self._torch
+        n_frames, frame_samples = frames.shape
+        audio = np.ascontiguousarray(frames.reshape(-1), dtype=np.float32)
+
+        with self._lock, torch.inference_mode():
+            signal = torch.from_numpy(audio).unsqueeze(0).to(self._device)
+            length = torch.tensor([len(audio)], device=self._device)
+            logits = self._model(input_signal=signal, input_signal_length=length)
+            probs = torch.softmax(logits, dim=-1)[0, :, 1].float().cpu().numpy()
+
+        # The model steps every 20ms; read its curve at the centre of each of our frames.
+        step = len(audio) / max(len(probs), 1)
+        centres = (np.arange(n_frames) + 0.5) * frame_samples
+        return np.interp(centres, (np.arange(len(probs)) + 0.5) * step, probs).astype(np.float32)
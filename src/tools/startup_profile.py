@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class StartupProfile:
+    """
+    Where process start-up goes: time spent importing each top-level
+    package (its own modules only, nested packages are counted separately,
+    like `python -X importtime`) and the model load phases.
+
+    install() as early as possible, before the imports worth timing. Lazy
+    imports on loader threads are timed as well, so they are also part of
+    the load phase they ran in.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: Dict[str, float] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finder: Optional[_TimingFinder] = None
+
+    def install(self) -> 'StartupProfile':
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def uninstall(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def report(self, timings: Optional[Dict[str, float]] = None, top: int = 12) -> str:
+        # timings: named phases in seconds, e.g. ModelPool.timings.
+        now = time.perf_counter()
+        lines = ["[I] Startup profile:"]
+        interpreter = _process_age()
+        if interpreter is not None:
+            lines.append(f"    {'interpreter start':<32} {interpreter - (now - self.started):>8.2f}s")
+        with self._lock:
+            imports: List[Tuple[str, float]] = sorted(self.imports.items(), key=lambda item: -item[1])
+        total_imports = sum(seconds for _, seconds in imports)
+        lines.append(f"    {'imports':<32} {total_imports:>8.2f}s")
+        for name, seconds in imports[:top]:
+            lines.append(f"      {name:<30} {seconds:>8.2f}s")
+        if len(imports) > top:
+            rest = sum(seconds for _, seconds in imports[top:])
+            lines.append(f"      {f'{len(imports) - top} more':<30} {rest:>8.2f}s")
+        for name, seconds in (timings or {}).items():
+            lines.append(f"    {name:<32} {seconds:>8.2f}s")
+        lines.append(f"    {'since profile install':<32} {now - self.started:>8.2f}s")
+        return "\n".join(lines)
+
+    def report_when_ready(self, models, uninstall: bool = True):
+        # Prints the report once a ModelPool has loaded, off the caller's thread.
+        def wait():
+            models.wait_until_ready()
+            if uninstall:
+                self.uninstall()
+            print(self.report(models.timings))
+
+        threading.Thread(target=wait, name='startup-profile', daemon=True).start()
+
+    def _enter(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+
+    def _exit(self, name: str, elapsed: float):
+        stack = self._local.stack
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            self.imports[name] = self.imports.get(name, 0.0) + elapsed - nested
+
+
+class _TimingFinder:
+    # Only consulted for modules not yet in sys.modules, i.e. first imports.
+    # The real finders locate the module; its loader is wrapped to time exec.
+    def __init__(self, profile: StartupProfile):
+        self.profile = profile
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimingLoader(spec.loader, fullname.partition('.')[0], self.profile)
+                return spec
+        return None
+
+
+class _TimingLoader:
+    def __init__(self, loader, package: str, profile: StartupProfile):
+        self.loader = loader
+        self.package = package
+        self.profile = profile
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # The module keeps its real loader, resource readers and reloads use it.
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.profile._enter()
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profile._exit(self.package, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+def _process_age() -> Optional[float]:
+    # Seconds since the process was created, Linux only.
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            start_ticks = int(f.read().rsplit(b')', 1)[1].split()[19])
+        with open('/proc/uptime', 'rb') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
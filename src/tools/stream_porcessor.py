@@ -1,66 +1,497 @@
-import torch
+import os
+import time
+import threading
 import numpy as np
+from concurrent.futures import CancelledError, Future
 from queue import Queue
-from typing import Tuple, Optional
+from dataclasses import dataclass
+from typing import List, NamedTuple, Tuple, Optional
 
-from src.tools.translator import Translator
 from src.tools.audio_writer import AudioWriter
 from src.tools.voice_detector import VoiceDetector
-from src.transcribe.whisper import WhisperModel
-from src.transcribe.parakeet import ParakeetModel
-from src.transcribe.canary import CanaryModel
+from src.tools.speech_scorer import SpeechScorer
+from src.tools.pipeline import PipelineStage
+from src.tools.model_pool import ModelPool
+from src.tools.transcript_cache import TranscriptCache
+from src.tools.metrics import metrics
+from src.tools.ingest import AudioIngest
+from src.tools.transcript_log import TranscriptLog
+from src.tools.transcript_filter import TranscriptFilter
+
+
+class Transcription(NamedTuple):
+    segment_id: int
+    chunk_path: str         # segment reference in the session's audio container, empty for partial and retracted rows
+    duration: float
+    text_en: str
+    text_ru: str
+    is_partial: bool = False
+    translating: bool = False   # final English, text_ru is empty or the translation generated so far
+
+
+@dataclass
+class SegmentJob:
+    segment_id: int
+    chunk_path: str
+    audio: np.ndarray
+    duration: float
+    speech_end_time: float = 0.0    # monotonic arrival of the last voiced frame
+    continues: bool = False         # starts with the overlap of a forced split of the previous segment
+    speculation: Optional[Future] = None    # decode started at the pause, confirmed by this endpoint
+    confirmed_at: float = 0.0               # perf_counter of the endpoint, for the latency speculation saved
+    cache_key: Optional[str] = None
+    text_en: str = ""
+    text_ru: str = ""
+
+
+@dataclass
+class SpeculativeJob:
+    audio: np.ndarray
+    future: Future
+
+
+@dataclass
+class PartialJob:
+    segment_id: int
+    audio: np.ndarray
+    duration: float
+
+
+def _observe_wasted(future: Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    _, started, finished = future.result()
+    metrics.observe('speculation_wasted_seconds', finished - started)
+
+
+def _normalize_word(word: str) -> str:
+    return word.strip(".,!?;:…\"'«»()-").casefold()
+
+
+def stitch_overlap(previous: str, text: str, max_words: int = 8, max_offset: int = 2) -> str:
+    # Drops the words at the start of text that repeat the end of previous.
+    # The longest run wins; a run of two or more words may start a word or
+    # two into text because the first word of the overlap is often cut and
+    # misheard.
+    words = text.split()
+    tail = [_normalize_word(w) for w in previous.split()[-max_words:]]
+    head = [_normalize_word(w) for w in words[:max_words + max_offset]]
+    for length in range(min(len(tail), len(head)), 0, -1):
+        offsets = min(max_offset, len(head) - length) if length > 1 else 0
+        for offset in range(offsets + 1):
+            if head[offset:offset + length] == tail[-length:]:
+                return " ".join(words[offset + length:])
+    return text
 
 
 class StreamProcessor:
-    def __init__(self, sample_rate: int):
+    def __init__(
+        self,
+        sample_rate: int,
+        model_pool: ModelPool,
+        session_id: str = 'default',
+        transcript_cache: Optional[TranscriptCache] = None,
+        asr_workers: int = 1,
+        translate_workers: int = 1,
+        queue_size: int = 16,
+        overflow: str = 'drop_oldest',  # policy for utterances arriving while ASR is saturated
+        partial_interval: Optional[float] = None,   # seconds of new speech between partial decodes, None disables
+        partial_window: Optional[float] = None,     # decode only the last N seconds of a long utterance
+        stable_prefix: bool = True,                 # commit words two consecutive partials agree on
+        vad_scorer: Optional[SpeechScorer] = None,  # e.g. a shared MarbleNetScorer, None keeps the energy VAD only
+        max_segment_duration: Optional[float] = 20.0,  # split continuous speech, keeps Canary under max_new_tokens
+        transcript_window: int = 200,               # rows kept in memory, older ones are paged from disk
+        speculative_silence: Optional[float] = None,   # start ASR after this much silence, before the 1.5s endpoint
+        stream_translation: bool = False,           # update the Russian text word by word, unbatched
+        transcript_filter: Optional[TranscriptFilter] = None,  # None applies the default rules
+    ):
         self.sample_rate = sample_rate
-        self._device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.session_id = session_id
+        self._models = model_pool
+        self._transcript_cache = transcript_cache
+        self._filter = transcript_filter or TranscriptFilter(sample_rate=sample_rate)
         self._transcribes_queue = Queue()
-        
+        self._speech_end_times = {}     # segment_id -> last voiced frame time, for end-to-end latency
+        self._english_end_times = {}    # the same, until the English row is read
+        self._segment_lock = threading.Lock()
+        self._previous_text: Tuple[int, str] = (-1, "")   # raw transcript of the last segment, for stitching
+
+        self.partial_interval = partial_interval
+        self.stream_translation = stream_translation
+        self.partial_window = partial_window
+        self.stable_prefix = stable_prefix and partial_window is None
+        self._partial_samples = 0
+        self._partial_emitted = False
+        self._partial_words: List[str] = []
+        self._committed_words: List[str] = []
+        self._speculation: Optional[Future] = None
+        self._speculation_submitted: Optional[Future] = None   # the last one, possibly discarded but still decoding
+
+        session_dir = os.path.join('./sessions', session_id)
         self._audio_writer = AudioWriter(
-            output_dir='./sessions',
+            output_dir=session_dir,
             sample_rate=self.sample_rate,
-            prefix='chunk'
+            prefix='chunk',
+            max_queue=queue_size * 4,
         )
+        # A reopened session keeps its container and history, new segments continue after them.
+        self._next_segment_id = max(self._audio_writer.segment_ids(), default=-1) + 1
+
+        self.transcript = TranscriptLog(path=os.path.join(session_dir, 'transcript.jsonl'), window=transcript_window)
+        self._ingest = AudioIngest(sample_rate=self.sample_rate)
 
         self._detector = VoiceDetector(
             sample_rate=self.sample_rate,
-            on_speech_end=self._on_speech_end
+            on_speech_end=self._on_speech_end,
+            on_speech_pause=self._on_speech_pause,
+            on_speech_resume=self._on_speech_resume,
+            scorer=vad_scorer,
         )
         self._detector.set_options(
             frame_duration = 0.03,
             energy_threshold = 0.01,
             min_silence_duration = 1.5,
+            max_utterance_duration = max_segment_duration,
+            speculative_silence = speculative_silence,
+        )
+
+        # The detector callback only enqueues; ASR and translation each run on
+        # their own bounded worker stage and the writer on its own thread, so
+        # neither a slow decode nor the disk ever stalls audio ingestion.
+        self._translate_stage = PipelineStage(
+            name='translate',
+            handler=self._translate_segment,
+            concurrency=translate_workers,
+            max_queue=queue_size,
+            overflow='block',
+            on_result=self._publish_segment,
         )
+        self._asr_stage = PipelineStage(
+            name='asr',
+            handler=self._transcribe_segment,
+            concurrency=asr_workers,
+            max_queue=queue_size,
+            overflow=overflow,
+            on_result=self._translate_stage.submit,
+            on_drop=self._drop_segment,
+        )
+        # Partials for the utterance in progress, only the newest snapshot is worth decoding.
+        self._partial_stage = PipelineStage(
+            name='partial',
+            handler=self._transcribe_partial,
+            concurrency=1,
+            max_queue=1,
+            overflow='drop_oldest',
+        )
+        # Decodes the utterance at a short pause, so a confirmed endpoint finds its text ready.
+        # At most one speculation is in flight, see _on_speech_pause.
+        self._speculate_stage = PipelineStage(
+            name='speculate',
+            handler=self._transcribe_speculative,
+            concurrency=1,
+            max_queue=1,
+            overflow='drop_newest',
+        )
+        for stage in (self._translate_stage, self._asr_stage, self._partial_stage, self._speculate_stage):
+            stage.start()
 
-        # self._asr = WhisperModel(model_name="openai/whisper-large-v3")
-        # self._asr = ParakeetModel(model_name="nvidia/parakeet-tdt-0.6b-v3")
-        self._asr = CanaryModel(model_name="nvidia/canary-qwen-2.5b")
+    def process_audio(self, audio_sr: int, audio_chunk: np.ndarray):
+        # Raw microphone chunk (any rate, int or float, mono or stereo)
+        with metrics.span('stage_seconds', stage='ingest'):
+            chunk = self._ingest.process(audio_sr, audio_chunk)
+        self.process_chunk(chunk)
 
-        self._translator = Translator(source='en', target='ru')
-    
     def process_chunk(self, chunk: np.ndarray):
-        self._detector.process_chunk(chunk)
-    
+        with metrics.span('stage_seconds', stage='vad'):
+            self._detector.process_chunk(chunk)
+        metrics.inc('ingested_audio_seconds_total', len(chunk) / self.sample_rate)
+        if self.partial_interval and self._detector.current_state == 'speech':
+            self._maybe_submit_partial()
+
     def start(self):
-        print(f"[I] StreamProcessor started")
-    
+        print(f"[I] StreamProcessor '{self.session_id}' started")
+
     def stop(self):
-        self._detector.reset()
-        print("[I] StreamProcessor stopped")
-    
-    def _on_speech_end(self, audio_data: np.ndarray, duration: float):
+        self._discard_speculation()
+        with self._segment_lock:
+            if self._partial_emitted or self._detector.current_state == 'speech':
+                # The utterance in progress is abandoned: its id is used up, so a
+                # partial still decoding for it is discarded, and its row taken back.
+                segment_id = self._next_segment_id
+                self._next_segment_id += 1
+                if self._partial_emitted:
+                    self._transcribes_queue.put(Transcription(segment_id, "", self._partial_samples / self.sample_rate, "", ""))
+            self._partial_emitted = False
+            self._partial_samples = 0
+            self._partial_words = []
+            self._committed_words = []
+            self._detector.reset()
+        self._ingest.reset()
+        print(f"[I] StreamProcessor '{self.session_id}' stopped")
+
+    def drain(self):
+        # Blocks until every utterance detected so far has been published and written.
+        for stage in (self._asr_stage, self._translate_stage):
+            stage.join()
+        self._audio_writer.flush()
+
+    def close(self):
+        # ASR may be waiting on a speculation, so the speculate stage outlives it.
+        for stage in (self._partial_stage, self._asr_stage, self._speculate_stage, self._translate_stage):
+            stage.stop()
+        self._audio_writer.close()
+        self.transcript.close()
+
+    def _on_speech_pause(self, audio_data: np.ndarray, duration: float):
         if duration < 0.5:
-            return # skip short audio
-        
-        chunk_path = self._audio_writer.write_chunk(audio_data)
-        text_en, text_ru = self.transcribe_segment(speech_array=audio_data)
-        self._transcribes_queue.put((chunk_path, duration, text_en, text_ru))
-
-    def get_transcribe(self) -> Optional[Tuple[str, float, str, str]]:
-        return None if self._transcribes_queue.empty() else self._transcribes_queue.get_nowait()
-    
+            return  # would be skipped at the endpoint anyway
+        if self._speculation_submitted is not None and not self._speculation_submitted.done():
+            # An earlier one still decodes, even if discarded; another would only queue behind it.
+            metrics.inc('speculation_total', outcome='busy')
+            return
+        future = Future()
+        if self._speculate_stage.submit(SpeculativeJob(audio=audio_data, future=future)):
+            self._speculation = self._speculation_submitted = future
+
+    def _on_speech_resume(self):
+        if self._discard_speculation():
+            metrics.inc('speculation_total', outcome='miss')
+
+    def _discard_speculation(self) -> bool:
+        future, self._speculation = self._speculation, None
+        if future is None:
+            return False
+        self._abandon(future)
+        return True
+
+    def _abandon(self, future: Future):
+        # A queued speculation is dropped; one already decoding runs to the end,
+        # and its decode time is counted as wasted.
+        if not future.cancel():
+            future.add_done_callback(_observe_wasted)
+
+    def _transcribe_speculative(self, job: SpeculativeJob):
+        if not job.future.set_running_or_notify_cancel():
+            return
+        started = time.perf_counter()
+        try:
+            text = self._models.transcribe(speech_array=job.audio)
+        except Exception as e:
+            job.future.set_exception(e)
+            return
+        job.future.set_result((text, started, time.perf_counter()))
+
+    def _on_speech_end(self, audio_data: np.ndarray, duration: float):
+        speculation = None
+        if self._detector.speculation_hit and self._speculation is not None:
+            speculation, self._speculation = self._speculation, None
+        elif self._discard_speculation():
+            metrics.inc('speculation_total', outcome='miss')
+
+        with self._segment_lock:
+            segment_id = self._next_segment_id
+            self._next_segment_id += 1
+            partial_emitted = self._partial_emitted
+            self._partial_emitted = False
+            self._partial_samples = 0
+
+            if duration < 0.5:
+                if partial_emitted:
+                    # Take back the partial row shown for this utterance
+                    self._transcribes_queue.put(Transcription(segment_id, "", duration, "", ""))
+                if speculation is not None:
+                    self._abandon(speculation)
+                return # skip short audio
+
+        job = SegmentJob(
+            segment_id=segment_id,
+            chunk_path=self._audio_writer.reference(segment_id),
+            audio=audio_data,
+            duration=duration,
+            speech_end_time=self._detector.last_speech_time,
+            continues=self._detector.continues_previous,
+            speculation=speculation,
+            confirmed_at=time.perf_counter(),
+        )
+        if speculation is not None:
+            metrics.inc('speculation_total', outcome='hit')
+        metrics.inc('utterances_total')
+        self._audio_writer.submit(segment_id, audio_data)
+        self._asr_stage.submit(job)
+
+    def _drop_segment(self, job: SegmentJob):
+        # Lost to ASR backpressure: take back its partial row, which would otherwise stay for good.
+        if job.speculation is not None:
+            self._abandon(job.speculation)
+        self._transcribes_queue.put(Transcription(job.segment_id, "", job.duration, "", ""))
+
+    def _transcribe_segment(self, job: SegmentJob) -> Optional[SegmentJob]:
+        if self._transcript_cache is not None:
+            job.cache_key = self._transcript_cache.make_key(job.audio, self._models.signature())
+        text = self._speculative_text(job)
+        if text is None:
+            text = self._models.transcribe(speech_array=job.audio)
+        # Segments reach this stage in order with the default single worker;
+        # if the previous one was dropped the overlap is left as is.
+        previous_id, previous_text = self._previous_text
+        self._previous_text = (job.segment_id, text)
+        if job.continues and previous_id == job.segment_id - 1:
+            text = stitch_overlap(previous_text, text)
+        job.text_en = text
+
+        reason = self._filter.check(text, job.audio, job.duration)
+        if reason is not None:
+            # Nothing to translate or show; also takes back a partial row if there was one.
+            metrics.inc('filtered_segments_total', reason=reason)
+            metrics.inc('model_calls_saved_total', model='translate')
+            self._transcribes_queue.put(Transcription(job.segment_id, "", job.duration, "", ""))
+            return None
+
+        # English goes out now; the Russian follows from the translate stage,
+        # which meanwhile overlaps the next segment's ASR.
+        self._speech_end_times[job.segment_id] = job.speech_end_time
+        self._english_end_times[job.segment_id] = job.speech_end_time
+        self._transcribes_queue.put(
+            Transcription(job.segment_id, job.chunk_path, job.duration, job.text_en, "", translating=True)
+        )
+        return job
+
+    def _speculative_text(self, job: SegmentJob) -> Optional[str]:
+        # The decode started at the pause; it covers the same speech as job.audio,
+        # which only has post-roll silence the speculative audio may lack.
+        if job.speculation is None:
+            return None
+        try:
+            text, started, finished = job.speculation.result()
+        except CancelledError:
+            return None
+        except Exception as e:
+            print(f"[W] Speculative decode failed, decoding again: {e}")
+            return None
+        # Decode time already elapsed when the endpoint was confirmed.
+        metrics.observe('speculation_saved_seconds', max(0.0, min(finished, job.confirmed_at) - started))
+        return text
+
+    def _translate_segment(self, job: SegmentJob) -> SegmentJob:
+        # A failed translation still publishes the English row, otherwise it
+        # would stay "translating" and its latency entry would never be popped.
+        try:
+            if self.stream_translation:
+                def on_text(text_ru: str):
+                    self._transcribes_queue.put(
+                        Transcription(job.segment_id, job.chunk_path, job.duration, job.text_en, text_ru, translating=True)
+                    )
+                job.text_ru = self._models.translate_stream(text=job.text_en, on_text=on_text)
+            else:
+                job.text_ru = self._models.translate(text=job.text_en)
+        except Exception as e:
+            print(f"[E] Translation of segment {job.segment_id} failed: {e}")
+            metrics.inc('translate_errors_total')
+            job.text_ru = ""
+            job.cache_key = None    # don't cache the missing translation
+        return job
+
+    def _publish_segment(self, job: SegmentJob):
+        if job.cache_key is not None:
+            self._transcript_cache.put(job.cache_key, job.text_en, job.text_ru)
+        metrics.inc('segments_total')
+        self._transcribes_queue.put(
+            Transcription(job.segment_id, job.chunk_path, job.duration, job.text_en, job.text_ru)
+        )
+
+    def _maybe_submit_partial(self):
+        utterance_samples = len(self._detector.utterance_buffer)
+        if utterance_samples - self._partial_samples < int(self.partial_interval * self.sample_rate):
+            return
+
+        self._partial_samples = utterance_samples
+        audio = self._detector.get_utterance(max_duration=self.partial_window)
+        self._partial_stage.submit(PartialJob(
+            segment_id=self._next_segment_id,
+            audio=audio,
+            duration=utterance_samples / self.sample_rate,
+        ))
+
+    def _transcribe_partial(self, job: PartialJob):
+        text = self._models.transcribe(speech_array=job.audio)
+
+        with self._segment_lock:
+            if job.segment_id < self._next_segment_id:
+                return  # the utterance ended while decoding, its final result supersedes this one
+            if self.partial_window is not None:
+                text = f"… {text}"
+            elif self.stable_prefix:
+                text = self._stabilize(text)
+            self._partial_emitted = True
+            self._transcribes_queue.put(Transcription(job.segment_id, "", job.duration, text, "", is_partial=True))
+
+    def _stabilize(self, text: str) -> str:
+        # Local agreement: a word prefix two consecutive hypotheses agree on is
+        # committed and kept verbatim in later partials, only the tail may change.
+        words = text.split()
+        if not self._partial_emitted:
+            self._partial_words = []
+            self._committed_words = []
+
+        agreed = 0
+        for previous, current in zip(self._partial_words, words):
+            if previous != current:
+                break
+            agreed += 1
+        if agreed > len(self._committed_words):
+            self._committed_words = words[:agreed]
+        self._partial_words = words
+
+        return " ".join(self._committed_words + words[len(self._committed_words):])
+
+    def get_transcribe(self) -> Optional[Transcription]:
+        if self._transcribes_queue.empty():
+            return None
+        transcription = self._transcribes_queue.get_nowait()
+        if transcription.is_partial:
+            return transcription
+        if transcription.translating:
+            speech_end_time = self._english_end_times.pop(transcription.segment_id, None)
+            if speech_end_time:
+                metrics.observe('e2e_en_latency_seconds', time.monotonic() - speech_end_time)
+        else:
+            speech_end_time = self._speech_end_times.pop(transcription.segment_id, None)
+            if speech_end_time:
+                metrics.observe('e2e_latency_seconds', time.monotonic() - speech_end_time)
+        return transcription
+
+    def read_segment(self, segment_id: int) -> Optional[np.ndarray]:
+        # int16 samples of a final segment at sample_rate, a read-only view of
+        # the memory-mapped container once written; None if it never was.
+        return self._audio_writer.read_segment(segment_id)
+
+    def update_transcript(self) -> bool:
+        # Moves everything published so far into self.transcript, True if a row changed.
+        changed = False
+        transcription = self.get_transcribe()
+        while transcription:
+            changed = self.transcript.apply(*transcription) or changed
+            transcription = self.get_transcribe()
+        return changed
+
     def transcribe_segment(self, speech_array: np.ndarray) -> Tuple[str, str]:
-        text_en = self._asr.transcribe(speech_array=speech_array)
-        text_ru = self._translator.translate(text=text_en)
-        return (text_en, text_ru)
\ No newline at end of file
+        cache_key = None
+        if self._transcript_cache is not None:
+            cache_key = self._transcript_cache.make_key(speech_array, self._models.signature())
+            cached = self._transcript_cache.get(cache_key)
+            if cached is not None:
+                return tuple(cached)
+
+        if speech_array.dtype == np.int16:
+            speech_array = speech_array.astype(np.float32) / 32768.0
+
+        text_en = self._models.transcribe(speech_array=speech_array)
+        reason = self._filter.check(text_en, speech_array, len(speech_array) / self.sample_rate)
+        if reason is not None:
+            metrics.inc('filtered_segments_total', reason=reason)
+            metrics.inc('model_calls_saved_total', model='translate')
+            return ("", "")
+        text_ru = self._models.translate(text=text_en)
+        if cache_key is not None:
+            self._transcript_cache.put(cache_key, text_en, text_ru)
+        return (text_en, text_ru)
@@ -0,0 +1,81 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from src.tools.lru_cache import LRUCache
+from src.tools.audio_writer import to_pcm16
+
+
+class TranscriptCache:
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        path: Optional[str] = None,     # sqlite file backing the in-memory LRU, None disables persistence
+        max_rows: int = 100_000,
+    ):
+        self.path = path
+        self.max_rows = max_rows
+        self._memory = LRUCache(max_entries=max_entries)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._puts = 0
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                "key TEXT PRIMARY KEY, text_en TEXT NOT NULL, text_ru TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(audio: np.ndarray, signature: str) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(signature.encode('utf-8'))
+        digest.update(np.ascontiguousarray(to_pcm16(audio)).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        result = self._memory.get(key)
+        if result is not None or self._db is None:
+            return result
+
+        with self._db_lock:
+            row = self._db.execute("SELECT text_en, text_ru FROM transcripts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._memory.put(key, row)
+        return row
+
+    def put(self, key: str, text_en: str, text_ru: str):
+        self._memory.put(key, (text_en, text_ru))
+        if self._db is None:
+            return
+
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (key, text_en, text_ru, created) VALUES (?, ?, ?, ?)",
+                (key, text_en, text_ru, time.time()),
+            )
+            self._puts += 1
+            if self._puts % 256 == 0:
+                self._db.execute(
+                    "DELETE FROM transcripts WHERE key IN ("
+                    "SELECT key FROM transcripts ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        return self._memory.stats()
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
@@ -0,0 +1,94 @@
+import re
+import numpy as np
+from typing import Iterable, Optional
+
+
+# What Canary and Whisper tend to produce for noise, music or silence.
+# Matched against the whole normalized segment text, never a substring.
+DEFAULT_BLOCKLIST = (
+    "thank you",
+    "thanks for watching",
+    "thank you for watching",
+    "thank you very much",
+    "thank you so much for watching",
+    "please subscribe",
+    "subscribe to my channel",
+    "music",
+    "applause",
+    "laughter",
+    "silence",
+    "blank audio",
+    "no speech",
+)
+
+
+def normalize_text(text: str) -> str:
+    # Casefolded words without punctuation or bracket markers like [MUSIC] and <blank_audio>.
+    return " ".join(re.findall(r"[^\W_]+(?:'[^\W_]+)?", text.casefold()))
+
+
+def load_blocklist(path: str) -> list:
+    # One phrase per line, '#' starts a comment.
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.split('#', 1)[0].strip() for line in f]
+    return [line for line in lines if line]
+
+
+class TranscriptFilter:
+    """
+    Rejects ASR output that isn't worth translating or showing: empty text
+    (a failed decode returns ""), known hallucinations, text with almost no
+    letters or digits, more text than the segment could hold, and segments
+    whose loudest frames are still near silence.
+
+    A blocklist phrase is also something people say, so it is only rejected
+    when the segment is short or quiet as well.
+
+    check() returns the reason for a rejection or None. Every rule can be
+    disabled by passing None (an empty blocklist for the blocklist).
+    """
+
+    def __init__(
+        self,
+        blocklist: Optional[Iterable[str]] = DEFAULT_BLOCKLIST,
+        min_chars: Optional[int] = 2,                   # letters and digits
+        max_chars_per_second: Optional[float] = 25.0,   # fast speech is ~15-18
+        min_peak_rms: Optional[float] = 0.01,           # 90th percentile of frame RMS
+        blocklist_max_duration: Optional[float] = 1.0,  # a blocklist hit this short is rejected even if loud
+        sample_rate: int = 16_000,
+        frame_duration: float = 0.03,
+    ):
+        self.blocklist = frozenset(normalize_text(phrase) for phrase in (blocklist or ()))
+        self.min_chars = min_chars
+        self.max_chars_per_second = max_chars_per_second
+        self.min_peak_rms = min_peak_rms
+        self.blocklist_max_duration = blocklist_max_duration
+        self.frame_samples = max(1, int(sample_rate * frame_duration))
+
+    def check(self, text: str, audio: Optional[np.ndarray] = None, duration: Optional[float] = None) -> Optional[str]:
+        if not text.strip():
+            return 'empty'
+        normalized = normalize_text(text)
+        low_energy = self.min_peak_rms is not None and audio is not None and self._peak_rms(audio) < self.min_peak_rms
+        if normalized in self.blocklist:
+            short = self.blocklist_max_duration is not None and duration is not None and duration <= self.blocklist_max_duration
+            if low_energy or short:
+                return 'blocklist'
+        chars = len(normalized.replace(" ", ""))
+        if self.min_chars is not None and chars < self.min_chars:
+            return 'min_content'
+        if self.max_chars_per_second is not None and duration and chars / duration > self.max_chars_per_second:
+            return 'too_fast'
+        if low_energy:
+            return 'low_energy'
+        return None
+
+    def _peak_rms(self, audio: np.ndarray) -> float:
+        if audio.dtype == np.int16:
+            audio = audio.astype(np.float32) / 32768.0
+        n_frames = len(audio) // self.frame_samples
+        if n_frames == 0:
+            return float(np.sqrt(np.mean(np.square(audio, dtype=np.float32)))) if len(audio) else 0.0
+        frames = audio[:n_frames * self.frame_samples].reshape(n_frames, self.frame_samples)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        return float(np.percentile(rms, 90))
@@ -0,0 +1,100 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+# Display rows are [segment_id, chunk_path, duration, text_en, text_ru].
+Row = list
+
+
+class TranscriptLog:
+    """
+    Rows of one session for the UI. Only the newest `window` rows stay in
+    memory; older final rows are appended to a JSON-lines file next to the
+    session's audio container and read back a page at a time.
+    """
+
+    def __init__(self, path: Optional[str] = None, window: int = 200):
+        self.path = path
+        self.window = window
+        self.version = 0        # bumped on every change, clients re-render only when it moved
+        self._rows: "OrderedDict[int, Row]" = OrderedDict()
+        self._offsets: List[int] = []   # byte offset of every history line
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self._load_offsets()
+
+    def apply(
+        self,
+        segment_id: int,
+        chunk_path: str,
+        duration: float,
+        text_en: str,
+        text_ru: str,
+        is_partial: bool = False,
+        translating: bool = False,
+    ) -> bool:
+        # A partial row is replaced in place by later partials and by the
+        # final result, a final without chunk_path retracts it. While the
+        # translation is pending its cell ends with an ellipsis.
+        with self._lock:
+            if not chunk_path and not is_partial:
+                if self._rows.pop(segment_id, None) is None:
+                    return False
+            else:
+                if translating:
+                    text_ru = f"{text_ru} …".lstrip()
+                self._rows[segment_id] = [segment_id, chunk_path, f"{duration:.3f}s", text_en, text_ru]
+            self.version += 1
+            while len(self._rows) > self.window:
+                _, row = self._rows.popitem(last=False)
+                self._archive(row)
+            return True
+
+    def rows(self) -> List[Row]:
+        with self._lock:
+            return [list(row) for row in self._rows.values()]
+
+    def history_pages(self, page_size: int) -> int:
+        return (len(self._offsets) + page_size - 1) // page_size
+
+    def page(self, page: int, page_size: int = 50) -> List[Row]:
+        # Page 0 holds the rows that most recently left the window.
+        with self._lock:
+            end = len(self._offsets) - page * page_size
+            start = max(0, end - page_size)
+            if self.path is None or end <= 0:
+                return []
+            offsets = self._offsets[start:end]
+        rows = []
+        with open(self.path, 'rb') as f:
+            f.seek(offsets[0])
+            for _ in offsets:
+                rows.append(json.loads(f.readline()))
+        return rows
+
+    def close(self):
+        # Final rows still in the window go to history, so a reopened session pages them.
+        with self._lock:
+            for row in self._rows.values():
+                if row[1]:
+                    self._archive(row)
+            self._rows.clear()
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self._rows)
+
+    def _archive(self, row: Row):
+        if self.path is None:
+            return
+        with open(self.path, 'ab') as f:
+            self._offsets.append(f.tell())
+            f.write((json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def _load_offsets(self):
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                self._offsets.append(offset)
+                offset += len(line)
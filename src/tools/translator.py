@@ -1,17 +1,124 @@
+import os
+import re
+from src.tools import model_cache
+model_cache.configure()
+
 import torch
-from transformers import T5ForConditionalGeneration, T5Tokenizer
+from typing import Callable, List, Optional
+from transformers import T5ForConditionalGeneration, T5Tokenizer, TextStreamer
+
+from src.tools.lru_cache import LRUCache
+from src.tools.cpu_fastpath import quantize_linear
+
 
 class Translator:
-    def __init__(self, source: str = 'en', target: str = 'ru'):
+    def __init__(
+        self,
+        source: str = 'en',
+        target: str = 'ru',
+        max_batch_size: int = 16,
+        cache_size: int = 4096,
+        cache_path: Optional[str] = None,
+        quantize: bool = False,                 # int8 dynamic quantization of Linear layers, CPU only
+        num_beams: Optional[int] = None,        # 1 forces greedy, None keeps the model's generation config
+        max_new_tokens: Optional[int] = None,   # cap per sentence, None keeps the model's generation config
+        local_copy: bool = False,               # keep a safetensors copy in the model cache and load it next time
+    ):
         self.model_name = 'utrobinmv/t5_translate_en_ru_zh_large_1024'
-        self.model = T5ForConditionalGeneration.from_pretrained(self.model_name)
+        path = model_cache.local_path(self.model_name)
+        weights = path if local_copy and os.path.exists(path) else self.model_name
+        self.model = T5ForConditionalGeneration.from_pretrained(weights)
+        self.tokenizer = T5Tokenizer.from_pretrained(weights)
+        if local_copy:
+            model_cache.save_local(path, self._save_pretrained)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model.to(self.device)
-        self.tokenizer = T5Tokenizer.from_pretrained(self.model_name)
+        self.model.eval()
+        self.quantize = quantize
+        if quantize:
+            self.model = quantize_linear(self.model, self.device)
+        self.generate_kwargs = {}
+        if num_beams is not None:
+            self.generate_kwargs['num_beams'] = num_beams
+        if max_new_tokens is not None:
+            self.generate_kwargs['max_new_tokens'] = max_new_tokens
+        self.target = target
         self.prefix = f'translate to {target}: '
+        self.max_batch_size = max_batch_size
+        self.cache = LRUCache(max_entries=cache_size, path=cache_path)
 
     def translate(self, text: str):
-        src_text = self.prefix + text
-        input_ids = self.tokenizer(src_text, return_tensors="pt")
-        generated_tokens = self.model.generate(**input_ids.to(self.device))
-        return self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+        return self.translate_batch([text])[0]
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        results: List[Optional[str]] = [None] * len(texts)
+        pending = {}  # cache key -> indexes of texts waiting for it
+        for i, text in enumerate(texts):
+            key = self._cache_key(text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            batch_keys = keys[start:start + self.max_batch_size]
+            translations = self._generate([texts[pending[key][0]] for key in batch_keys])
+            for key, translation in zip(batch_keys, translations):
+                self.cache.put(key, translation)
+                for i in pending[key]:
+                    results[i] = translation
+        return results
+
+    def translate_stream(self, text: str, on_text: Callable[[str], None]) -> str:
+        # One sentence, unbatched: on_text gets the translation so far each
+        # time the streamer completes a word. Cached sentences return at once.
+        key = self._cache_key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        streamer = _CallbackStreamer(self.tokenizer, on_text)
+        input_ids = self.tokenizer([self.prefix + text], return_tensors="pt")
+        with torch.inference_mode():
+            generated_tokens = self.model.generate(**input_ids.to(self.device), streamer=streamer, **self.generate_kwargs)
+        translation = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+        self.cache.put(key, translation)
+        return translation
+
+    def warmup(self):
+        # Bypasses the cache so the first real sentence doesn't pay for allocations.
+        self._generate(["Hello."])
+
+    def _save_pretrained(self, path: str):
+        # Before quantization: the saved weights are the original ones.
+        self.model.save_pretrained(path, safe_serialization=True)
+        self.tokenizer.save_pretrained(path)
+
+    def _generate(self, texts: List[str]) -> List[str]:
+        src_texts = [self.prefix + text for text in texts]
+        input_ids = self.tokenizer(src_texts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            generated_tokens = self.model.generate(**input_ids.to(self.device), **self.generate_kwargs)
+        return self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+
+    def close(self):
+        self.cache.close()
+
+    def _cache_key(self, text: str):
+        # Whitespace only: "US"/"us" or "May"/"may" translate differently.
+        return (self.target, re.sub(r'\s+', ' ', text).strip())
+
+
+class _CallbackStreamer(TextStreamer):
+    # TextStreamer decodes incrementally and hands over text at word boundaries.
+    def __init__(self, tokenizer, on_text: Callable[[str], None]):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.on_text = on_text
+        self.text = ""
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.text += text
+            self.on_text(self.text.strip())
@@ -1,6 +1,11 @@
+import time
 import numpy as np
 from typing import Optional, Callable
 
+from src.tools.ring_buffer import RingBuffer
+from src.tools.speech_scorer import SpeechScorer
+from src.tools.metrics import metrics
+
 class VoiceDetector:
     def __init__(
         self, 
@@ -8,14 +13,38 @@ class VoiceDetector:
         frame_duration: float = 0.03,       # seconds
         energy_threshold: float = 0.01,     # RMS threshold for speech detection
         min_silence_duration: float = 2.5,  # seconds to detect end of speech
-        on_speech_end: Optional[Callable[[np.ndarray, float], None]] = None
+        on_speech_end: Optional[Callable[[np.ndarray, float], None]] = None,
+        scorer: Optional[SpeechScorer] = None,  # second opinion on frames that pass the energy gate
+        speech_threshold: float = 0.6,      # scorer probability that starts speech
+        silence_threshold: float = 0.4,     # and the one it has to drop below to stop
+        pre_roll: Optional[float] = None,
+        post_roll: Optional[float] = None,
+        max_utterance_duration: Optional[float] = None,
+        on_speech_pause: Optional[Callable[[np.ndarray, float], None]] = None,
+        on_speech_resume: Optional[Callable[[], None]] = None,
+        speculative_silence: Optional[float] = None,
+        max_buffer_duration: float = 30.0,
+        buffer_overflow: str = 'drop_oldest',
     ):
         self.sample_rate = sample_rate
         self.on_speech_end_fn = on_speech_end
+        self.on_speech_pause_fn = on_speech_pause
+        self.on_speech_resume_fn = on_speech_resume
+        self.scorer = scorer
+        self.speech_threshold = speech_threshold
+        self.silence_threshold = silence_threshold
+        self.frames_total = 0
+        self.frames_scored = 0
         self.set_options(
             frame_duration=frame_duration,
             energy_threshold=energy_threshold,
             min_silence_duration=min_silence_duration,
+            pre_roll=pre_roll,
+            post_roll=post_roll,
+            max_utterance_duration=max_utterance_duration,
+            speculative_silence=speculative_silence,
+            max_buffer_duration=max_buffer_duration,
+            buffer_overflow=buffer_overflow,
         )
 
     def set_options(
@@ -23,15 +52,51 @@ class VoiceDetector:
         frame_duration: float,
         energy_threshold: float,
         min_silence_duration: float,
+        pre_roll: Optional[float] = None,   # seconds kept before the onset, None is half of min_silence_duration
+        post_roll: Optional[float] = None,  # seconds kept after the last voiced frame, same default
+        max_utterance_duration: Optional[float] = None,   # force a split in continuous speech, None never splits
+        split_window: float = 2.0,          # seconds before the limit searched for the quietest frame
+        split_overlap: float = 0.5,         # seconds the next piece repeats before the cut
+        speculative_silence: Optional[float] = None,   # pause that fires on_speech_pause ahead of the endpoint, None disables
+        max_buffer_duration: float = 30.0,  # utterance memory cap, forces a split when max_utterance_duration is None
+        buffer_overflow: str = 'drop_oldest',   # RingBuffer policy, only reached if pre_roll exceeds the cap
     ):
         self.frame_duration = frame_duration
         self.frame_samples = int(self.sample_rate * self.frame_duration)
         self.energy_threshold = energy_threshold
         self.min_silence_duration = min_silence_duration
         self.min_silence_samples = int(self.sample_rate * self.min_silence_duration)
-        self.overlap_samples = self.min_silence_samples // 2
+        overlap_samples = self.min_silence_samples // 2
+        self.pre_roll_samples = overlap_samples if pre_roll is None else int(self.sample_rate * pre_roll)
+        self.post_roll_samples = overlap_samples if post_roll is None else int(self.sample_rate * post_roll)
+        # Without a configured limit the buffer cap becomes one, an utterance
+        # that long is split rather than losing its start to the ring buffer.
+        split_limit = max_buffer_duration if max_utterance_duration is None else max_utterance_duration
+        if split_window + split_overlap >= split_limit:
+            raise ValueError(
+                f"max_utterance_duration or max_buffer_duration ({split_limit}s) must exceed split_window + split_overlap "
+                f"({split_window + split_overlap}s)"
+            )
+        self.max_utterance_samples = int(self.sample_rate * split_limit)
+        self.split_window_samples = int(self.sample_rate * split_window)
+        self.split_overlap_samples = int(self.sample_rate * split_overlap)
+        if speculative_silence is not None and speculative_silence >= min_silence_duration:
+            raise ValueError(
+                f"speculative_silence ({speculative_silence}s) must be shorter than min_silence_duration "
+                f"({min_silence_duration}s)"
+            )
+        self.speculative_samples = None if speculative_silence is None else int(self.sample_rate * speculative_silence)
+        # One buffer for pre-roll, utterance and not yet classified samples, sized
+        # once: the longest utterance plus one slice of input and a partial frame.
+        capacity = max(self.max_utterance_samples, self.pre_roll_samples) + self.sample_rate + self.frame_samples
+        self._audio = RingBuffer(capacity, dtype=np.float32, overflow=buffer_overflow)
         self.reset()
 
+    @property
+    def nbytes(self) -> int:
+        # Fixed per detector, independent of how long the stream runs.
+        return self._audio.nbytes
+
     def process_chunk(self, chunk: np.ndarray):
         """
         chunk:
@@ -43,58 +108,197 @@ class VoiceDetector:
         - value_range: [-1.0, 1.0]       # нормализовано по амплитуде
         - format:      raw PCM (не WAV, просто массив сэмплов)
         """
-        chunk = np.concatenate((self.pending_buffer, chunk))
-        self.pending_buffer = np.array([], dtype=np.float32)
+        chunk = np.asarray(chunk, dtype=np.float32)
+        # At most a second per pass, the ring buffer is sized for that.
+        for offset in range(0, len(chunk), self.sample_rate):
+            self._process_slice(chunk[offset:offset + self.sample_rate])
+
+    def _process_slice(self, chunk: np.ndarray):
+        # The ring buffer holds [pre-roll or utterance][unclassified samples];
+        # classifying frames only moves the boundary between the two.
+        dropped = self._audio.dropped
+        self._unclassified += self._audio.append(chunk)
+        if self._audio.dropped != dropped:
+            lost = self._audio.dropped - dropped
+            print(f"[W] VoiceDetector buffer full, {lost / self.sample_rate:.2f}s of audio dropped ({self._audio.overflow})")
+            metrics.inc('vad_dropped_seconds_total', lost / self.sample_rate)
+        fs = self.frame_samples
+        n_frames = self._unclassified // fs
+        if n_frames == 0:
+            return
 
-        while len(chunk) >= self.frame_samples:
-            frame = chunk[:self.frame_samples]
-            chunk = chunk[self.frame_samples:]
-            energy = np.sqrt(np.mean(frame**2))
-            is_speech = energy > self.energy_threshold
+        # Classify every complete frame at once, the state machine below only
+        # walks the transitions of the resulting boolean array.
+        first = len(self._audio) - self._unclassified
+        frames = self._audio.view(first, first + n_frames * fs).reshape(n_frames, fs)
+        is_speech = self._classify(frames)
 
+        # Wall-clock arrival of the newest voiced frame, resolution is one chunk.
+        now = time.monotonic()
+        i = 0
+        while i < n_frames:
             if self.current_state == 'silence':
-                self.silence_buffer = np.concatenate((self.silence_buffer, frame))
-                if len(self.silence_buffer) > self.overlap_samples:
-                    self.silence_buffer = self.silence_buffer[-self.overlap_samples:]
-                
-                if is_speech:
-                    self.current_state = 'speech'
-                    self.utterance_buffer = np.concatenate((self.silence_buffer, frame))
-                    self.silence_buffer = np.array([], dtype=np.float32)
-                    self.consecutive_silence_samples = 0
+                onsets = np.flatnonzero(is_speech[i:])
+                if len(onsets) == 0:
+                    self._push_silence(n_frames - i)
+                    break
+
+                # The pre-roll, ending with the onset frame, starts the utterance.
+                j = i + int(onsets[0])
+                self._push_silence(j + 1 - i)
+                self.last_speech_time = now
+                self.current_state = 'speech'
+                self.consecutive_silence_samples = 0
+                i = j + 1
             else:  # speech
-                self.utterance_buffer = np.concatenate((self.utterance_buffer, frame))
-                
-                if is_speech:
-                    self.consecutive_silence_samples = 0
-                else:
-                    self.consecutive_silence_samples += self.frame_samples
-                    
-                    if self.consecutive_silence_samples >= self.min_silence_samples:
-                        trim_samples = self.consecutive_silence_samples - self.overlap_samples
-                        
-                        if trim_samples > 0:
-                            utterance = self.utterance_buffer[:-trim_samples]
-                        else:
-                            utterance = self.utterance_buffer.copy()
-                        
-                        utt_duration = len(utterance) / self.sample_rate
-                        
-                        if self.on_speech_end_fn:
-                            self.on_speech_end_fn(utterance, utt_duration)
-                        
-                        remaining_silence = self.utterance_buffer[-trim_samples:] if trim_samples > 0 else np.array([], dtype=np.float32)
-                        self.silence_buffer = remaining_silence.copy()
-                        
-                        self.current_state = 'silence'
-                        self.consecutive_silence_samples = 0
-                        self.utterance_buffer = np.array([], dtype=np.float32)
-
-        self.pending_buffer = chunk
+                # Samples of consecutive silence at every frame from i on,
+                # carrying over the run that was open at the previous chunk.
+                idx = np.arange(n_frames - i)
+                last_voiced = np.maximum.accumulate(np.where(is_speech[i:], idx, -1))
+                silence_run = (idx - last_voiced) * fs
+                silence_run[last_voiced < 0] += self.consecutive_silence_samples
+
+                ends = np.flatnonzero(silence_run >= self.min_silence_samples)
+                if len(ends) == 0:
+                    if last_voiced[-1] >= 0:
+                        self.last_speech_time = now
+                    self._unclassified -= (n_frames - i) * fs
+                    self.consecutive_silence_samples = int(silence_run[-1])
+                    self._maybe_split()
+                    self._check_speculation()
+                    break
+
+                if last_voiced[ends[0]] >= 0:
+                    self.last_speech_time = now
+                k = i + int(ends[0])
+                self._unclassified -= (k + 1 - i) * fs
+                self.consecutive_silence_samples = int(silence_run[ends[0]])
+                self._maybe_split()
+                self._check_speculation(at_end=True)
+                self._end_utterance()
+                i = k + 1
+
+    def _classify(self, frames: np.ndarray) -> np.ndarray:
+        # RMS energy is the cheap first pass; the scorer only runs on chunks
+        # where some frame passes it, and frames below it count as silence.
+        energy = np.sqrt(np.mean(frames**2, axis=1))
+        is_loud = energy > self.energy_threshold
+        self.frames_total += len(frames)
+        if self.scorer is None:
+            return is_loud
+        if not is_loud.any():
+            self._scorer_speech = False
+            return is_loud
+
+        self.frames_scored += len(frames)
+        probs = np.where(is_loud, self.scorer.score(frames), 0.0)
+        # Hysteresis: above speech_threshold is speech, below silence_threshold
+        # is silence, anything between keeps the previous frame's decision.
+        decided = np.where(probs >= self.speech_threshold, 1, np.where(probs < self.silence_threshold, 0, -1))
+        idx = np.arange(len(decided))
+        last_decided = np.maximum.accumulate(np.where(decided >= 0, idx, -1))
+        is_speech = np.where(last_decided >= 0, decided[np.maximum(last_decided, 0)] == 1, self._scorer_speech)
+        self._scorer_speech = bool(is_speech[-1])
+        return is_speech
+
+    @property
+    def utterance_buffer(self) -> np.ndarray:
+        # View into the ring buffer, only valid until the next process_chunk.
+        if self.current_state != 'speech':
+            return self._audio.view(0, 0)
+        return self._audio.view(0, self._classified())
+
+    def get_utterance(self, max_duration: Optional[float] = None) -> np.ndarray:
+        # Copy of the utterance in progress, optionally only its last max_duration seconds.
+        utterance = self.utterance_buffer
+        if max_duration is not None:
+            utterance = utterance[-int(max_duration * self.sample_rate):]
+        return utterance.copy()
+
+    def _classified(self) -> int:
+        return len(self._audio) - self._unclassified
+
+    def _push_silence(self, n_frames: int):
+        # Keeps only the last pre_roll_samples of silence.
+        self._unclassified -= n_frames * self.frame_samples
+        excess = self._classified() - self.pre_roll_samples
+        if excess > 0:
+            self._audio.drop_front(excess)
+
+    def _voiced_end(self) -> int:
+        return self._classified() - self.consecutive_silence_samples
+
+    def _trimmed_utterance(self) -> np.ndarray:
+        # The utterance as it would be emitted now: post_roll_samples of the trailing silence kept.
+        trim_samples = self.consecutive_silence_samples - self.post_roll_samples
+        buffered = self.utterance_buffer
+        return buffered[:-trim_samples] if trim_samples > 0 else buffered
+
+    def _check_speculation(self, at_end: bool = False):
+        # A speculation stays valid while nothing voiced was added after it;
+        # at the confirmed endpoint its audio differs from the final utterance
+        # only in how much trailing silence is included.
+        if self._speculated_at is not None and self._voiced_end() != self._speculated_at:
+            self._speculated_at = None
+            if self.on_speech_resume_fn:
+                self.on_speech_resume_fn()
+        if (not at_end and self._speculated_at is None and self.speculative_samples is not None
+                and self.consecutive_silence_samples >= self.speculative_samples):
+            self._speculated_at = self._voiced_end()
+            if self.on_speech_pause_fn:
+                utterance = self._trimmed_utterance().copy()
+                self.on_speech_pause_fn(utterance, len(utterance) / self.sample_rate)
+
+    def _maybe_split(self):
+        # Cuts continuous speech at the quietest frame shortly before the
+        # limit. The rest stays in the buffer as the next piece, starting
+        # split_overlap before the cut; continues_previous marks that piece
+        # so its transcript can be stitched to this one.
+        while self._classified() >= self.max_utterance_samples:
+            fs = self.frame_samples
+            limit = self.max_utterance_samples
+            n_frames = self.split_window_samples // fs
+            utterance = self.utterance_buffer
+            window = utterance[limit - n_frames * fs:limit].reshape(n_frames, fs)
+            quietest = int(np.argmin(np.einsum('ij,ij->i', window, window)))
+            cut = limit - (n_frames - quietest) * fs + fs // 2
+
+            piece = utterance[:cut].copy()
+            if self.on_speech_end_fn:
+                self.on_speech_end_fn(piece, len(piece) / self.sample_rate)
+
+            self._audio.drop_front(cut - self.split_overlap_samples)
+            self.consecutive_silence_samples = min(self.consecutive_silence_samples, self._classified())
+            self.continues_previous = True
+            if self._speculated_at is not None:
+                self._speculated_at = None
+                if self.on_speech_resume_fn:
+                    self.on_speech_resume_fn()
+
+    def _end_utterance(self):
+        utterance = self._trimmed_utterance().copy()
+        utt_duration = len(utterance) / self.sample_rate
+
+        # Read by on_speech_end: the last on_speech_pause audio holds this utterance's speech.
+        self.speculation_hit = self._speculated_at is not None
+        if self.on_speech_end_fn:
+            self.on_speech_end_fn(utterance, utt_duration)
+        self.speculation_hit = False
+        self._speculated_at = None
+
+        # The trimmed silence stays in the buffer as the next pre-roll.
+        self._audio.drop_front(len(utterance))
+        self.current_state = 'silence'
+        self.consecutive_silence_samples = 0
+        self.continues_previous = False
 
     def reset(self):
-        self.utterance_buffer = np.array([], dtype=np.float32)
-        self.pending_buffer = np.array([], dtype=np.float32)
-        self.silence_buffer = np.array([], dtype=np.float32)
+        self._audio.clear()
+        self._unclassified = 0
+        self.last_speech_time = 0.0
         self.current_state = 'silence'
         self.consecutive_silence_samples = 0
+        self._scorer_speech = False
+        self.continues_previous = False     # the utterance in progress began inside a forced split
+        self._speculated_at: Optional[int] = None  # voiced end of the utterance when on_speech_pause fired
+        self.speculation_hit = False
@@ -0,0 +1,396 @@
+import sys
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import numpy as np
+from concurrent.futures import Future
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from queue import Queue, Empty
+from typing import Any, Dict, List, Optional
+
+from src.tools.metrics import metrics
+from src.transcribe import registry
+
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _worker_main(conn: Connection):
+    # Runs in the child process: load one backend, then serve requests whose
+    # audio sits in the shared-memory block at the given (offset, length) spans.
+    config = conn.recv()
+    shm = SharedMemory(name=config['shm_name'])
+    # The parent owns the block; without this the child's resource tracker unlinks it on exit.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    try:
+        if config['threads']:
+            from src.tools.cpu_fastpath import configure_threads
+            configure_threads(config['threads'], 1)
+        registry.register_backend(config['backend'], *config['spec'])
+        start = time.perf_counter()
+        asr = registry.create_backend(config['backend'], model_name=config['model_name'], **config['options'])
+        if config['warmup_duration'] > 0:
+            asr.transcribe_batch([np.zeros(int(16_000 * config['warmup_duration']), dtype=np.float32)])
+        conn.send(('ready', asr.model_name, time.perf_counter() - start))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+        shm.close()
+        return
+
+    samples = np.ndarray((shm.size // 4,), dtype=np.float32, buffer=shm.buf)
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'ping':
+                conn.send(('pong',))
+            elif message[0] == 'transcribe':
+                _, request_id, spans = message
+                arrays = [samples[offset:offset + length] if inline is None else inline for offset, length, inline in spans]
+                start = time.perf_counter()
+                texts = asr.transcribe_batch(arrays)
+                del arrays
+                conn.send(('result', request_id, texts, time.perf_counter() - start))
+            elif message[0] == 'stop':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del samples
+        asr.unload_model()
+        shm.close()
+
+
+class _Job:
+    __slots__ = ('audio', 'future', 'attempts')
+
+    def __init__(self, audio: np.ndarray, future: Future):
+        self.audio = audio
+        self.future = future
+        self.attempts = 0
+
+
+class _Worker:
+    """Parent-side handle: one process, its shared-memory block and a dispatcher thread."""
+
+    def __init__(self, pool: "InferencePool", index: int):
+        self.pool = pool
+        self.index = index
+        self.jobs: "Queue[_Job]" = Queue()
+        self.pending = 0                # queued plus in flight, for least-loaded routing
+        self.alive = False
+        self.restarts = 0
+        self.shm = SharedMemory(create=True, size=pool.shm_bytes)
+        self._samples = np.ndarray((self.shm.size // 4,), dtype=np.float32, buffer=self.shm.buf)
+        self._process = None
+        self._conn = None
+        self._request_id = 0
+        self._thread = threading.Thread(target=self._run, name=f"asr-worker-{index}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _spawn(self) -> bool:
+        # A fresh interpreter running this module rather than multiprocessing's spawn,
+        # which would re-execute the launching script (app.py builds its models at import).
+        pool = self.pool
+        parent_sock, child_sock = socket.socketpair()
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', 'src.tools.worker_pool', '--fd', str(child_sock.fileno())],
+            pass_fds=(child_sock.fileno(),),
+            cwd=_PROJECT_ROOT,
+        )
+        child_sock.close()
+        self._conn = Connection(parent_sock.detach())
+        self._conn.send({
+            'shm_name': self.shm.name,
+            'backend': pool.backend,
+            'spec': registry.backend_spec(pool.backend),
+            'model_name': pool.model_name,
+            'options': pool.options,
+            'threads': pool.threads_per_worker,
+            'warmup_duration': pool.warmup_duration,
+        })
+
+        if not self._conn.poll(pool.load_timeout):
+            print(f"[E] ASR worker {self.index} did not load within {pool.load_timeout:.0f}s")
+            self._kill()
+            return False
+        try:
+            message = self._conn.recv()
+        except EOFError:
+            message = ('error', f"exited with code {self._process.wait()}")
+        if message[0] != 'ready':
+            print(f"[E] ASR worker {self.index} failed to load: {message[1]}")
+            self._kill()
+            return False
+        print(f"[I] ASR worker {self.index} (pid {self._process.pid}) ready: '{message[1]}' in {message[2]:.2f}s")
+        self.alive = True
+        return True
+
+    def _kill(self):
+        self.alive = False
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait(timeout=5)
+            self._process = None
+
+    def _restart(self, reason: str):
+        print(f"[W] Restarting ASR worker {self.index}: {reason}")
+        self._kill()
+        self.restarts += 1
+        metrics.inc('worker_restarts_total', worker=str(self.index))
+
+    def _call(self, message: tuple, timeout: float) -> Optional[tuple]:
+        try:
+            self._conn.send(message)
+            if not self._conn.poll(timeout):
+                self._restart(f"no reply to '{message[0]}' within {timeout:.0f}s")
+                return None
+            return self._conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            exitcode = self._process.poll() if self._process is not None else None
+            self._restart(f"{type(e).__name__}, exit code {exitcode}")
+            return None
+
+    def _collect(self) -> List[_Job]:
+        # Up to max_batch_size jobs whose audio fits the shared block together.
+        try:
+            batch = [self.jobs.get(timeout=0.5)]
+        except Empty:
+            return []
+        used = len(batch[0].audio)
+        deadline = time.monotonic() + self.pool.max_wait
+        while len(batch) < self.pool.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except Empty:
+                break
+            if used + len(job.audio) > len(self._samples):
+                self.jobs.put(job)  # next batch
+                break
+            batch.append(job)
+            used += len(job.audio)
+        return batch
+
+    def _run(self):
+        last_seen = time.monotonic()
+        # On close, whatever is already queued is still transcribed.
+        while not (self.pool.closed and self.jobs.empty()):
+            if not self.alive:
+                if self.pool.closed:
+                    break
+                if not self._spawn():
+                    time.sleep(self.pool.restart_backoff)
+                    continue
+                last_seen = time.monotonic()
+
+            batch = self._collect()
+            if not batch:
+                # Idle: health check, a hung or dead worker is replaced before the next request.
+                if time.monotonic() - last_seen >= self.pool.health_interval:
+                    reply = self._call(('ping',), self.pool.health_timeout)
+                    if reply is not None and reply[0] != 'pong':
+                        self._restart(f"unexpected reply {reply[0]!r} to ping")
+                    last_seen = time.monotonic()
+                continue
+            batch = [job for job in batch if self._start(job)]
+            if batch:
+                self._dispatch(batch)
+            last_seen = time.monotonic()
+
+        self._shutdown()
+
+    def _shutdown(self):
+        if self.alive:
+            try:
+                self._conn.send(('stop',))
+                self._process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self._kill()
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except Empty:
+                break
+            if job.attempts or job.future.set_running_or_notify_cancel():
+                job.future.set_exception(RuntimeError("ASR worker pool closed"))
+            self._done(job)
+
+    def _dispatch(self, batch: List[_Job]):
+        spans = []
+        offset = 0
+        for job in batch:
+            n = len(job.audio)
+            if offset + n <= len(self._samples):
+                self._samples[offset:offset + n] = job.audio
+                spans.append((offset, n, None))
+                offset += n
+            else:
+                spans.append((0, n, np.asarray(job.audio, dtype=np.float32)))   # longer than the block, pickled
+        self._request_id += 1
+
+        audio_seconds = sum(len(job.audio) for job in batch) / 16_000
+        reply = self._call(('transcribe', self._request_id, spans), self.pool.request_timeout + 2 * audio_seconds)
+        if reply is None or reply[0] != 'result' or reply[1] != self._request_id:
+            if reply is not None:
+                self._restart(f"unexpected reply {reply[0]!r}")
+            for job in batch:
+                self.pool.retry(job, self)
+            return
+
+        _, _, texts, elapsed = reply
+        worker = str(self.index)
+        metrics.observe('model_seconds', elapsed, model='asr', backend=self.pool.backend, worker=worker)
+        metrics.observe('batch_size', len(batch), model='asr', worker=worker)
+        if audio_seconds > 0:
+            metrics.observe('asr_rtf', elapsed / audio_seconds, backend=self.pool.backend)
+        metrics.inc('asr_audio_seconds_total', audio_seconds, backend=self.pool.backend)
+        for job, text in zip(batch, texts):
+            job.future.set_result(text)
+            self._done(job)
+
+    def _start(self, job: _Job) -> bool:
+        # Retried jobs are already running; fresh ones may have been cancelled while queued.
+        if job.attempts or job.future.set_running_or_notify_cancel():
+            return True
+        self._done(job)
+        return False
+
+    def _done(self, job: _Job):
+        with self.pool._lock:
+            self.pending -= 1
+
+    def join(self):
+        self._thread.join()
+
+    def release(self):
+        del self._samples
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePool:
+    """
+    ASR backends in separate processes, one model per process, so decoding
+    scales past the GIL. Audio travels through a shared-memory block per
+    worker; only offsets and text go through the pipe. Requests go to the
+    worker with the fewest pending utterances, a worker that crashes, hangs
+    or fails a health check is restarted and its in-flight batch retried once.
+    """
+
+    def __init__(
+        self,
+        n_workers: int,
+        backend: str = 'canary',
+        model_name: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,   # backend constructor arguments, e.g. quantize
+        threads_per_worker: Optional[int] = None,   # torch intra-op threads in each process
+        warmup_duration: float = 1.0,
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+        max_audio_seconds: float = 120.0,           # shared block size per worker
+        load_timeout: float = 600.0,
+        request_timeout: float = 60.0,              # plus twice the batch's audio duration
+        health_interval: float = 5.0,               # idle seconds between pings
+        health_timeout: float = 10.0,
+        restart_backoff: float = 1.0,
+    ):
+        if n_workers < 1:
+            raise ValueError(f"InferencePool needs at least one worker, got {n_workers}")
+        self.backend = backend
+        self.model_name = model_name or registry.default_model(backend)
+        self.options = dict(options or {})
+        self.threads_per_worker = threads_per_worker
+        self.warmup_duration = warmup_duration
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.shm_bytes = int(max_audio_seconds * 16_000) * 4
+        self.load_timeout = load_timeout
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.restart_backoff = restart_backoff
+        self.quantize = bool(self.options.get('quantize', False))
+        self.closed = False
+        self._lock = threading.Lock()
+        self._workers = [_Worker(self, i) for i in range(n_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def ready(self) -> bool:
+        return any(worker.alive for worker in self._workers)
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def submit(self, speech_array: np.ndarray) -> Future:
+        if self.closed:
+            raise RuntimeError("ASR worker pool is closed")
+        future = Future()
+        self._route(_Job(np.asarray(speech_array, dtype=np.float32), future))
+        return future
+
+    def transcribe(self, speech_array: np.ndarray) -> str:
+        return self.submit(speech_array).result()
+
+    def transcribe_batch(self, speech_arrays: List[np.ndarray]) -> List[str]:
+        futures = [self.submit(speech_array) for speech_array in speech_arrays]
+        return [future.result() for future in futures]
+
+    def retry(self, job: _Job, failed: _Worker):
+        failed._done(job)
+        job.attempts += 1
+        if job.attempts > 1 or self.closed:
+            job.future.set_exception(RuntimeError("ASR worker failed on this utterance"))
+            return
+        self._route(job, exclude=failed)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{'worker': w.index, 'alive': w.alive, 'pending': w.pending, 'restarts': w.restarts} for w in self._workers]
+
+    def close(self):
+        # Queued utterances are finished first, then the processes exit and the blocks are freed.
+        self.closed = True
+        for worker in self._workers:
+            worker.join()
+        for worker in self._workers:
+            worker.release()
+
+    def unload_model(self):
+        self.close()
+
+    def _route(self, job: _Job, exclude: Optional[_Worker] = None):
+        # Least loaded among live workers; while none is up, jobs wait on the least loaded of all.
+        with self._lock:
+            candidates = [w for w in self._workers if w.alive and w is not exclude] or \
+                         [w for w in self._workers if w is not exclude] or self._workers
+            worker = min(candidates, key=lambda w: w.pending)
+            worker.pending += 1
+        worker.jobs.put(job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR worker process, started by InferencePool")
+    parser.add_argument('--fd', type=int, required=True, help="inherited socket to the parent")
+    args = parser.parse_args()
+    _worker_main(Connection(args.fd))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,50 @@
 import os
-os.environ["NEMO_CACHE_DIR"] = "/tmp/nemo_models_cache"
+from src.tools import model_cache
+model_cache.configure()
 
 import torch
 import numpy as np
+from typing import List
+
+from src.tools.cpu_fastpath import quantize_linear
 
             
 class CanaryModel:
-    def __init__(self, model_name: str = "nvidia/canary-qwen-2.5b"):
+    def __init__(
+        self,
+        model_name: str = "nvidia/canary-qwen-2.5b",
+        load: bool = True,
+        quantize: bool = False,         # int8 dynamic quantization of Linear layers, CPU only
+        max_new_tokens: int = 128,      # greedy decode cap per utterance
+        local_copy: bool = False,       # keep a safetensors copy in the model cache and load it next time
+    ):
         self._device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model_name = model_name
+        self.quantize = quantize
+        self.max_new_tokens = max_new_tokens
+        self.local_copy = local_copy
         self._model = None
-        self.load_model(model_name=model_name)
+        if load:
+            self.load_model(model_name=model_name)
         
     def load_model(self, model_name: str):
         try:
             self.unload_model()
+            self.model_name = model_name
             from nemo.collections.speechlm2.models import SALM
             print(f"[I] Loading Canary-Qwen model '{model_name}'...")
-            self._model = SALM.from_pretrained(model_name).to(self._device)
+            path = model_cache.local_path(model_name)
+            if self.local_copy and os.path.exists(path):
+                model = SALM.from_pretrained(path)
+            else:
+                model = SALM.from_pretrained(model_name)
+                if self.local_copy:
+                    model_cache.save_local(path, model.save_pretrained)
+            model = model.to(self._device)
+            model.eval()
+            if self.quantize:
+                model = quantize_linear(model, self._device)
+            self._model = model
             print(f"[I] Canary-Qwen model loaded successfully on {self._device}")
         except Exception as e:
             print(f"[E] Failed to load Canary-Qwen model: {e}")
@@ -31,28 +59,31 @@ class CanaryModel:
                 torch.cuda.empty_cache()
 
     def transcribe(self, speech_array: np.ndarray) -> str:
+        return self.transcribe_batch([speech_array])[0]
+
+    def transcribe_batch(self, speech_arrays: List[np.ndarray]) -> List[str]:
         if self._model is None:
             print("[W] Model not loaded. Cannot transcribe.")
-            return ""
+            return [""] * len(speech_arrays)
         
         try:
-            if isinstance(speech_array, np.ndarray):
-                speech_tensor = torch.from_numpy(speech_array).float()
-            else:
-                speech_tensor = speech_array
-            
-            audios = speech_tensor.unsqueeze(0).to(self._device)
-            audio_lens = torch.tensor([speech_tensor.shape[0]], dtype=torch.int64).to(self._device)
+            # Right-pad every utterance to the longest one, audio_lens masks the padding
+            audio_lens = [len(speech_array) for speech_array in speech_arrays]
+            audios = torch.zeros((len(speech_arrays), max(audio_lens)), dtype=torch.float32)
+            for i, speech_array in enumerate(speech_arrays):
+                if isinstance(speech_array, np.ndarray):
+                    speech_array = torch.from_numpy(speech_array)
+                audios[i, :audio_lens[i]] = speech_array.float()
             
-            answer_ids = self._model.generate(
-                prompts=[
-                    [{"role": "user", "content": f"Transcribe the following: {self._model.audio_locator_tag}"}],
-                ],
-                audios=audios,
-                audio_lens=audio_lens,
-                max_new_tokens=128,
-            )
-            return self._model.tokenizer.ids_to_text(answer_ids[0].cpu())
+            prompt = [{"role": "user", "content": f"Transcribe the following: {self._model.audio_locator_tag}"}]
+            with torch.inference_mode():
+                answer_ids = self._model.generate(
+                    prompts=[prompt] * len(speech_arrays),
+                    audios=audios.to(self._device),
+                    audio_lens=torch.tensor(audio_lens, dtype=torch.int64).to(self._device),
+                    max_new_tokens=self.max_new_tokens,
+                )
+            return [self._model.tokenizer.ids_to_text(ids.cpu()) for ids in answer_ids]
         except Exception as e:
             print(f"[E] Transcription failed: {e}")
-            return ""
\ No newline at end of file
+            return [""] * len(speech_arrays)
\ No newline at end of file
@@ -1,13 +1,26 @@
 import os
-os.environ["NEMO_CACHE_DIR"] = "/tmp/nemo_models_cache"
+from src.tools import model_cache
+model_cache.configure()
 
 import torch
 import numpy as np
+from typing import List
+
+from src.tools.cpu_fastpath import quantize_linear
 
 
 class ParakeetModel:
-    def __init__(self, model_name: str = "nvidia/parakeet-tdt-0.6b-v3"):
+    def __init__(
+        self,
+        model_name: str = "nvidia/parakeet-tdt-0.6b-v3",
+        load: bool = True,
+        quantize: bool = False,         # int8 dynamic quantization of Linear layers, CPU only
+        local_copy: bool = False,       # keep a .nemo in the model cache and restore from it next time
+    ):
         self._device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model_name = model_name
+        self.quantize = quantize
+        self.local_copy = local_copy
         self._model = None
         # Supported models:
         # EncDecRNNTBPEModel
@@ -17,17 +30,28 @@ class ParakeetModel:
         #   nvidia/parakeet-tdt-1.1b
         # EncDecCTCModelBPE
         #   nvidia/parakeet-ctc-1.1b
-        self.load_model(model_name=model_name)
+        if load:
+            self.load_model(model_name=model_name)
 
     def load_model(self, model_name: str):
         try:
             self.unload_model()
+            self.model_name = model_name
             import nemo.collections.asr as nemo_asr
             print(f"[I] Loading Parakeet model '{model_name}'...")
-            model = nemo_asr.models.EncDecRNNTBPEModel.from_pretrained(model_name).to(self._device)
+            path = model_cache.local_path(model_name, '.nemo')
+            if self.local_copy and os.path.exists(path):
+                model = nemo_asr.models.ASRModel.restore_from(path, map_location=self._device)
+            else:
+                model = nemo_asr.models.EncDecRNNTBPEModel.from_pretrained(model_name)
+                if self.local_copy:
+                    model_cache.save_local(path, model.save_to)
+            model = model.to(self._device)
             model.cfg.decoding.strategy = "greedy_batch"
             model.change_decoding_strategy(model.cfg.decoding)
             model.eval()
+            if self.quantize:
+                model = quantize_linear(model, self._device)
             print(f"[I] Parakeet model loaded successfully on {self._device}")
             self._model = model
         except Exception as e:
@@ -43,32 +67,37 @@ class ParakeetModel:
                 torch.cuda.empty_cache()
 
     def transcribe(self, speech_array: np.ndarray) -> str:
+        return self.transcribe_batch([speech_array])[0]
+
+    def transcribe_batch(self, speech_arrays: List[np.ndarray]) -> List[str]:
         if self._model is None:
             print("[W] Model not loaded. Cannot transcribe.")
-            return ""
+            return [""] * len(speech_arrays)
         
         try:
             # Use autocast only on CUDA devices
             if self._device == 'cuda':
                 with torch.cuda.amp.autocast(enabled=True, dtype=torch.bfloat16):
                     with torch.inference_mode():
-                        return self._transcribe_internal(speech_array)
+                        return self._transcribe_internal(speech_arrays)
             else:
                 with torch.inference_mode():
-                    return self._transcribe_internal(speech_array)
+                    return self._transcribe_internal(speech_arrays)
         except Exception as e:
             print(f"[E] Transcription failed: {e}")
-            return ""
+            return [""] * len(speech_arrays)
     
-    def _transcribe_internal(self, speech_array: np.ndarray) -> str:
+    def _transcribe_internal(self, speech_arrays: List[np.ndarray]) -> List[str]:
         transcripts = self._model.transcribe(
-            audio=[speech_array],
-            batch_size=1,
+            audio=list(speech_arrays),
+            batch_size=len(speech_arrays),
             timestamps=False,
             verbose=False
         )
-        transcript = transcripts[0]
-        
+        return [self._to_text(transcript) for transcript in transcripts]
+
+    @staticmethod
+    def _to_text(transcript) -> str:
         if isinstance(transcript, str):
             return transcript
         if hasattr(transcript, "text"):
@@ -0,0 +1,44 @@
+import importlib
+from typing import Dict, List, Optional, Tuple
+
+# name -> (module, class, default model); modules are imported only when a
+# backend is created so nemo/transformers stay out of process start-up.
+_BACKENDS: Dict[str, Tuple[str, str, str]] = {
+    'whisper': ('src.transcribe.whisper', 'WhisperModel', 'openai/whisper-large-v3'),
+    'parakeet': ('src.transcribe.parakeet', 'ParakeetModel', 'nvidia/parakeet-tdt-0.6b-v3'),
+    'canary': ('src.transcribe.canary', 'CanaryModel', 'nvidia/canary-qwen-2.5b'),
+}
+
+
+def register_backend(name: str, module: str, class_name: str, default_model: str):
+    _BACKENDS[name] = (module, class_name, default_model)
+
+
+def available_backends() -> List[str]:
+    return sorted(_BACKENDS)
+
+
+def default_model(name: str) -> str:
+    return _lookup(name)[2]
+
+
+def backend_spec(name: str) -> Tuple[str, str, str]:
+    # (module, class, default model), enough to re-register a backend in a worker process.
+    return _lookup(name)
+
+
+def backend_class(name: str) -> type:
+    module_name, class_name, _ = _lookup(name)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_backend(name: str, model_name: Optional[str] = None, load: bool = True, **options):
+    cls = backend_class(name)
+    return cls(model_name=model_name or default_model(name), load=load, **options)
+
+
+def _lookup(name: str) -> Tuple[str, str, str]:
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ASR backend '{name}', expected one of {available_backends()}") from None
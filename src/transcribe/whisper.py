@@ -1,26 +1,51 @@
 import os
-os.environ["TRANSFORMERS_CACHE"] = "/tmp/hf_models_cache"
+from src.tools import model_cache
+model_cache.configure()
 
 import torch
 import numpy as np
+from typing import List, Optional
+
+from src.tools.cpu_fastpath import quantize_linear
 
 class WhisperModel:
-    def __init__(self, model_name: str = "openai/whisper-large-v3"):
+    def __init__(
+        self,
+        model_name: str = "openai/whisper-large-v3",
+        load: bool = True,
+        quantize: bool = False,                 # int8 dynamic quantization of Linear layers, CPU only
+        num_beams: int = 1,                     # 1 is greedy
+        max_new_tokens: Optional[int] = None,   # cap per 30s window, None keeps the model default
+        local_copy: bool = False,               # keep a safetensors copy in the model cache and load it next time
+    ):
         self._device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model_name = model_name
+        self.quantize = quantize
+        self.num_beams = num_beams
+        self.max_new_tokens = max_new_tokens
+        self.local_copy = local_copy
         self._pipe = None
-        self.load_model(model_name=model_name)
+        if load:
+            self.load_model(model_name=model_name)
 
     def load_model(self, model_name: str):
         try:
             self.unload_model()
+            self.model_name = model_name
             from transformers import pipeline
             print(f"[I] Loading Whisper model '{model_name}'...")
+            path = model_cache.local_path(model_name)
             self._pipe = pipeline(
                 task="automatic-speech-recognition",
-                model=model_name,
+                model=path if self.local_copy and os.path.exists(path) else model_name,
                 chunk_length_s=30,
                 device=self._device,
             )
+            if self.local_copy:
+                model_cache.save_local(path, lambda target: self._pipe.save_pretrained(target, safe_serialization=True))
+            self._pipe.model.eval()
+            if self.quantize:
+                self._pipe.model = quantize_linear(self._pipe.model, self._device)
             print(f"[I] Whisper model loaded successfully on {self._device}")
         except Exception as e:
             print(f"[E] Failed to load Whisper model: {e}")
@@ -35,21 +60,29 @@ class WhisperModel:
                 torch.cuda.empty_cache()
 
     def transcribe(self, speech_array: np.ndarray) -> str:
+        return self.transcribe_batch([speech_array])[0]
+
+    def transcribe_batch(self, speech_arrays: List[np.ndarray]) -> List[str]:
         if self._pipe is None:
             print("[W] Model not loaded. Cannot transcribe.")
-            return ""
+            return [""] * len(speech_arrays)
         
         try:
-            inputs = {
-                "array": speech_array, 
-                "sampling_rate": self._pipe.feature_extractor.sampling_rate
-            }
-            result = self._pipe(
-                inputs, 
-                batch_size=8, 
-                generate_kwargs={"task": 'transcribe'}
-            )
-            return result["text"]
+            sampling_rate = self._pipe.feature_extractor.sampling_rate
+            inputs = [
+                {"array": speech_array, "sampling_rate": sampling_rate}
+                for speech_array in speech_arrays
+            ]
+            generate_kwargs = {"task": 'transcribe', "num_beams": self.num_beams}
+            if self.max_new_tokens is not None:
+                generate_kwargs["max_new_tokens"] = self.max_new_tokens
+            with torch.inference_mode():
+                results = self._pipe(
+                    inputs, 
+                    batch_size=max(8, len(inputs)), 
+                    generate_kwargs=generate_kwargs
+                )
+            return [result["text"] for result in results]
         except Exception as e:
             print(f"[E] Transcription failed: {e}")
-            return ""
+            return [""] * len(speech_arrays)
\ No newline at end of file